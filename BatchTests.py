@@ -1,27 +1,262 @@
 import argparse
+import asyncio
+import atexit
+import collections
+import contextlib
 import csv
 import datetime
+import importlib
+import io
+import itertools
+import json
 import logging
+import math
+import mmap
 import os
-import shutil
+import random
+import resource
+import socket
+import statistics
 import subprocess
+import sys
+import threading
 import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, wait
 from concurrent.futures.process import ProcessPoolExecutor
-from datetime import timedelta
-from random import random
+from concurrent.futures.thread import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener
 
-import cx_Oracle
-import mysql.connector
-import psycopg2
+import numpy as np
 from colorama import Fore, Style
-from faker import Faker
 
 
-class TransactionBench:
-    drop_table_p = """drop table if exists customers_test"""
-    drop_table_o = """drop table customers_test purge"""
+class GeneratedDataStream:
+    # Minimal file-like object over the blocks produced by TransactionBench.generate_blocks() so that psycopg2's
+    # copy_from can pull rows straight from the generator without them ever touching the filesystem.
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.block = b""
+        self.offset = 0
+        self.bytes_read = 0
+
+    def _next_block(self):
+        while self.offset >= len(self.block):
+            self.block = next(self.blocks, None)
+            self.offset = 0
+            if self.block is None:
+                self.block = b""
+                return False
+        return True
+
+    def read(self, size=-1):
+        if not self._next_block():
+            return b""
+        if size is None or size < 0:
+            size = len(self.block) - self.offset
+        chunk = self.block[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def readline(self, size=-1):
+        if not self._next_block():
+            return b""
+        end = self.block.find(b"\n", self.offset)
+        end = len(self.block) if end == -1 else end + 1
+        if size is not None and size >= 0:
+            end = min(end, self.offset + size)
+        line = self.block[self.offset:end]
+        self.offset = end
+        self.bytes_read += len(line)
+        return line
+
+
+# --compress codecs and the suffix each adds to the datafile names. zstd and lz4 come from the optional zstandard and lz4
+# packages, imported only when they're used
+compression_suffixes = {'gzip': '.gz', 'zstd': '.zst', 'lz4': '.lz4'}
+
+# Codecs that need a package of their own
+compression_packages = {'zstd': 'zstandard', 'lz4': 'lz4'}
+
+
+class Lz4Compressor:
+    # LZ4FrameCompressor with the compressobj() style compress()/flush() interface of the other codecs
+
+    def __init__(self):
+        import lz4.frame
+        self.compressor = lz4.frame.LZ4FrameCompressor()
+        self.header = self.compressor.begin()
+
+    def compress(self, data):
+        header, self.header = self.header, b""
+        return header + self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+def compression_codec(file_name):
+    return next((codec for codec, suffix in compression_suffixes.items() if file_name.endswith(suffix)), None)
+
+
+def new_compressor(codec):
+    # Fastest levels, the point is to trade a little CPU for a lot less scratch disk I/O
+    if codec == 'gzip':
+        return zlib.compressobj(1, zlib.DEFLATED, 31)
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=1).compressobj()
+    return Lz4Compressor()
+
+
+def new_decompressor(codec):
+    if codec == 'gzip':
+        return zlib.decompressobj(31)
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj()
+    import lz4.frame
+    return lz4.frame.LZ4FrameDecompressor()
+
+
+def decompressed_blocks(file_name, decompress_seconds):
+    # Yields the rows of a compressed datafile in line aligned blocks (as generate_blocks() does) and adds the time spent
+    # decompressing to decompress_seconds[0]. Concatenated datafiles are a series of gzip members or zstd/lz4 frames
+    codec = compression_codec(file_name)
+    decompressor = new_decompressor(codec)
+    remainder = b""
+    with open(file_name, 'rb') as data_file:
+        for data in iter(lambda: data_file.read(1024 * 1024), b""):
+            start = time.perf_counter()
+            parts = [remainder]
+            while data:
+                parts.append(decompressor.decompress(data))
+                data = b""
+                if decompressor.eof:
+                    data = decompressor.unused_data
+                    decompressor = new_decompressor(codec)
+            decompress_seconds[0] += time.perf_counter() - start
+            block = b"".join(parts)
+            end = block.rfind(b"\n") + 1
+            remainder = block[end:]
+            if end:
+                yield block[:end]
+    if remainder:
+        yield remainder
+
+
+class SeedPool:
+    # Seed rows stored as an offsets array and a single byte blob rather than a list of dicts. On disk that's two .npy
+    # files. For a run they're copied once into a multiprocessing.shared_memory segment laid out as [offsets][blob] which
+    # worker processes attach to from a pool initializer, so the pool is never pickled and never copied per worker.
+
+    def __init__(self, offsets_file, blob_file):
+        self.offsets_file = offsets_file
+        self.blob_file = blob_file
+        self.shared_memory = None
+        self.owner = False
+        self.offsets = None
+        self.blob = None
+
+    def __getstate__(self):
+        # Workers get the pool through TransactionBench.init_worker(), never by pickling
+        return {'offsets_file': self.offsets_file, 'blob_file': self.blob_file, 'shared_memory': None, 'owner': False, 'offsets': None, 'blob': None}
+
+    def __len__(self):
+        return len(self.offsets) - 1
 
-    table_defintion_p = """create table customers_test(
+    def exists(self):
+        return os.path.isfile(self.offsets_file) and os.path.isfile(self.blob_file)
+
+    def save(self, seed_rows):
+        offsets = np.zeros(len(seed_rows) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in seed_rows], out=offsets[1:])
+        blob = np.frombuffer(b"".join(seed_rows), dtype=np.uint8)
+        # Write to temporary names first so an interrupted run never leaves a half written pool behind
+        for file_name, array in ((self.blob_file, blob), (self.offsets_file, offsets)):
+            with open(f'{file_name}.tmp', 'wb') as f:
+                np.save(f, array)
+            os.replace(f'{file_name}.tmp', file_name)
+
+    def share(self):
+        offsets = np.load(self.offsets_file, mmap_mode='r')
+        blob = np.load(self.blob_file, mmap_mode='r')
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=offsets.nbytes + max(blob.nbytes, 1))
+        self.owner = True
+        np.ndarray(offsets.shape, dtype=np.int64, buffer=self.shared_memory.buf)[:] = offsets
+        np.ndarray(blob.shape, dtype=np.uint8, buffer=self.shared_memory.buf, offset=offsets.nbytes)[:] = blob
+        self._map(len(offsets))
+
+    @classmethod
+    def attach(cls, name, offsets_count):
+        pool = cls(None, None)
+        pool.shared_memory = shared_memory.SharedMemory(name=name)
+        pool._map(offsets_count)
+        return pool
+
+    def _map(self, offsets_count):
+        self.offsets = np.ndarray((offsets_count,), dtype=np.int64, buffer=self.shared_memory.buf)
+        self.blob = self.shared_memory.buf[self.offsets.nbytes:]
+
+    def size_mb(self):
+        return self.shared_memory.size / 1048576
+
+    def release(self):
+        if self.shared_memory is not None:
+            self.offsets = None
+            self.blob.release()
+            self.blob = None
+            self.shared_memory.close()
+            if self.owner:
+                self.shared_memory.unlink()
+            self.shared_memory = None
+
+
+# Set in each generating worker process by TransactionBench.init_worker()
+worker_seed_pool = None
+worker_data_seed = None
+worker_startup_time = None
+
+# (pid, PooledConnection, connect start, connect end) for the process's pooled connection when running with --connectionpool
+process_connection = None
+
+# A forked worker inherits its parent's pooled connection, socket and all. Freeing that copy would have the driver end
+# the session (psycopg2's PQfinish, MySQL's COM_QUIT, OCI's logoff) under the parent, so workers keep it referenced here
+inherited_connections = []
+
+
+backends = {}
+
+
+def register_backend(cls):
+    backends[cls.name] = cls
+    return cls
+
+
+class Backend:
+    # A target database. Each backend supplies its own DDL, bulk load strategy and connection factory. Drivers are imported
+    # inside connect() so a run only needs (and only pays for importing) the driver of the --target it was given.
+    name = None
+
+    # Whether -u/-p are needed to connect
+    requires_login = True
+
+    # True if the bulk loader can only read from a named file, in which case --stream feeds it through a FIFO per worker
+    loads_from_pipe = False
+
+    # DML strategies (--dmlstrategy) offered by the backend mapped to the method that inserts one batch of typed rows.
+    # The first one is the default. Backends without any can only use their bulk loader
+    dml_strategies = {}
+
+    drop_table = """drop table if exists customers_test"""
+
+    table_definition = """create table customers_test(
                             Id numeric,
                             Email varchar(50),
                             Prefix varchar(50),
@@ -43,7 +278,487 @@ class TransactionBench:
                             Password varchar(50)
                             )"""
 
-    table_defintion_o = """create table customers_test(
+    customer_columns = [
+        {"ColumnName": "id",
+         "DataType": "Number"},
+        {"ColumnName": "email",
+         "DataType": "String",
+         "Size": 50},
+        {"ColumnName": "prefix",
+         "DataType": "String",
+         "Size": 50},
+        {"ColumnName": "name",
+         "DataType": "String",
+         "Size": 50},
+        {"ColumnName": "birth_date",
+         "DataType": "Date"},
+        {"ColumnName": "phone_number",
+         "DataType": "String",
+         "Size": 50},
+        {"ColumnName": "additional_email",
+         "DataType": "String",
+         "Size": 50},
+        {"ColumnName": "address",
+         "DataType": "String",
+         "Size": 200},
+        {"ColumnName": "postcode",
+         "DataType": "String",
+         "Size": 50},
+        {"ColumnName": "city",
+         "DataType": "String",
+         "Size": 50},
+        {"ColumnName": "county",
+         "DataType": "String",
+         "Size": 50},
+        {"ColumnName": "country",
+         "DataType": "String",
+         "Size": 50},
+        {"ColumnName": "yearjoined",
+         "DataType": "Number"},
+        {"ColumnName": "timejoined",
+         "DataType": "Timestamp"},
+        {"ColumnName": "link",
+         "DataType": "String",
+         "Size": 200},
+        {"ColumnName": "comments",
+         "DataType": "String",
+         "Size": 50},
+        {"ColumnName": "occupation",
+         "DataType": "String",
+         "Size": 100},
+        {"ColumnName": "bank",
+         "DataType": "String",
+         "Size": 20},
+        {"ColumnName": "password",
+         "DataType": "String",
+         "Size": 50}
+    ]
+
+    create_pk = """ALTER TABLE customers_test ADD PRIMARY KEY (Id)"""
+
+    # With --parallelindexes the primary key is built as a plain unique index alongside the others and attached to the
+    # table afterwards, as adding it directly takes an exclusive lock that serialises against their builds. Backends
+    # that can't attach an existing index leave attach_pk as None and build the primary key first, on its own
+    create_pk_index = """CREATE UNIQUE INDEX CUST_PK ON customers_test(Id)"""
+    attach_pk = None
+
+    # False where index builds can't overlap at all, --parallelindexes then builds them one after another
+    concurrent_index_builds = True
+
+    warm_up_statement = """select 1"""
+
+    # Queries returning (counter, value) rows snapshotted around each phase with --servercounters, and the counters
+    # worth printing. The rest are only saved with the results
+    counter_queries = []
+    headline_counters = []
+
+    create_index_1 = """CREATE INDEX CUST_INDEX_1 ON customers_test(Email)"""
+
+    create_index_2 = """CREATE INDEX CUST_INDEX_2 ON customers_test(Birth_Date)"""
+
+    create_index_3 = """CREATE INDEX CUST_INDEX_3 ON customers_test(City)"""
+
+    def __init__(self, args):
+        self.username = args.user
+        self.password = args.password
+        self.hostname = args.hostname
+        self.database = args.database
+        self.connection_string = args.connectionstring
+        self.use_dml_to_load = args.dmlload
+        self.dml_strategy = args.dmlstrategy
+        self.dml_batch_size = args.dmlbatchsize
+        self.dml_commit_size = args.dmlcommitsize
+        self.debugging = args.debug
+        self.index_parallelism = args.indexparallelism
+
+    def bind_marker(self, position):
+        # Placeholder for the position'th (from 1) bind variable in the driver's paramstyle
+        return '%s'
+
+    def index_statements(self, concurrent=False):
+        # [index, statements] for each index, run in order on one session. With --indexparallelism the backend adds
+        # whatever it needs to build each index with that many server processes
+        create_pk = self.create_pk_index if concurrent and self.attach_pk else self.create_pk
+        indexes = [['Primary key', [create_pk]], ['CUST_INDEX_1', [self.create_index_1]],
+                   ['CUST_INDEX_2', [self.create_index_2]], ['CUST_INDEX_3', [self.create_index_3]]]
+        if self.index_parallelism:
+            indexes = [[index, self.parallel_index_statements(index, statements[0], self.index_parallelism)] for index, statements in indexes]
+        return indexes
+
+    def parallel_index_statements(self, index, statement, degree):
+        return [statement]
+
+    def connect(self):
+        # Processes started with --connectionpool keep one connection open for their lifetime and hand it out here
+        if process_connection is not None and process_connection[0] == os.getpid():
+            return process_connection[1]
+        return self.open_connection()
+
+    def open_connection(self):
+        raise NotImplementedError
+
+    def open_pooled_connection(self):
+        # Opens this process's pooled connection and returns how long that took
+        global process_connection
+        start = time.perf_counter()
+        connection = PooledConnection(self.open_connection())
+        process_connection = (os.getpid(), connection, start, time.perf_counter())
+        return process_connection[3] - start
+
+    def server_counters(self, connection):
+        # Snapshot of the server's cumulative counters as {name: value}, from counter_queries which return (name, value)
+        # rows. Queries the server doesn't support (e.g. views added in later versions) are skipped
+        counters = {}
+        with connection.cursor() as cur:
+            for query in self.counter_queries:
+                try:
+                    cur.execute(query)
+                    for name, value in cur.fetchall():
+                        try:
+                            counters[name] = float(value)
+                        except (TypeError, ValueError):
+                            pass
+                except Exception as e:
+                    logging.debug(f"Counter query failed : {e}")
+                    connection.rollback()
+        # Ends the transaction, PostgreSQL for one returns the same statistics snapshot until it does
+        connection.commit()
+        return counters
+
+    def warm_up(self):
+        with self.connect() as connection:
+            with connection.cursor() as cur:
+                cur.execute(self.warm_up_statement)
+                cur.fetchall()
+
+    def create_table(self, connection, cur):
+        cur.execute(self.drop_table)
+        logging.debug(f"Statement executed : {self.drop_table}")
+        cur.execute(self.table_definition)
+        logging.debug(f"Statement executed : {self.table_definition}")
+
+    def load(self, file_details, loading_with_indexes, data_stream=None):
+        raise NotImplementedError
+
+    def load_dml(self, file_details, data_stream=None):
+        # Loads with application style INSERTs, dml_batch_size rows per call and committing every dml_commit_size rows
+        strategy = self.dml_strategy or next(iter(self.dml_strategies))
+        insert_batch = getattr(self, self.dml_strategies[strategy])
+        with self.open_data(file_details, data_stream) as data_file:
+            with self.connect() as connection:
+                with self.dml_cursor(connection, strategy) as cur:
+                    rows = self.typed_rows(self.read_lines(data_file))
+                    uncommitted = 0
+                    while True:
+                        batch = list(itertools.islice(rows, self.dml_batch_size))
+                        if not batch:
+                            break
+                        insert_batch(cur, batch)
+                        uncommitted += len(batch)
+                        if uncommitted >= self.dml_commit_size:
+                            connection.commit()
+                            uncommitted = 0
+                    connection.commit()
+
+    def dml_cursor(self, connection, strategy):
+        return connection.cursor()
+
+    def is_lock_error(self, exception):
+        # True for lock timeouts and deadlocks, which the parallel update retries
+        return False
+
+    def lock_timeout_statements(self, seconds):
+        # Run at the start of each parallel update session so that a row lock wait fails with a lock error after about
+        # seconds, and is retried and counted as lock wait, rather than blocking unseen until the lock is released
+        return []
+
+    def reset_lock_timeout_statements(self):
+        # Puts the session back afterwards, for pooled connections that go on to other phases
+        return []
+
+    def lock_chunk_statement(self, seconds):
+        # For servers with no session wide lock timeout for DML, a statement run before each chunk's update that locks
+        # its rows, binding the first and last Id, and fails with a lock error if they're still locked after seconds
+        return None
+
+    def cleanup(self):
+        pass
+
+    @staticmethod
+    def open_data(file_details, data_stream=None):
+        # Binary file-like object over the rows, either the --stream generator or the datafile
+        if data_stream is not None:
+            return contextlib.nullcontext(data_stream)
+        return open(os.path.join(os.getcwd(), file_details[1]), 'rb')
+
+    @staticmethod
+    def read_lines(data_file):
+        # Memory map regular files. Pipes (--stream) and --stream generators are just read a line at a time
+        try:
+            return iter(mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ).readline, b"")
+        except (AttributeError, io.UnsupportedOperation, OSError, ValueError):
+            return iter(data_file.readline, b"")
+
+    def convert_date(self, value):
+        # DD-MM-YYYY
+        return datetime.datetime(int(value[6:10]), int(value[3:5]), int(value[0:2]))
+
+    def convert_time(self, value):
+        # HH24:MI:SS
+        return datetime.time(int(value[0:2]), int(value[3:5]), int(value[6:8]))
+
+    def typed_rows(self, lines):
+        # Turns "|" delimited lines into tuples of Python values matching customer_columns so DML loads can bind them
+        # directly instead of leaving the conversion to the server. Seed values repeat so conversions are cached.
+        dates = {}
+        times = {}
+        for line in lines:
+            f = line.rstrip(b"\n").decode('utf-8').split('|')
+            birth_date = dates.get(f[4])
+            if birth_date is None:
+                birth_date = dates[f[4]] = self.convert_date(f[4])
+            time_joined = times.get(f[13])
+            if time_joined is None:
+                time_joined = times[f[13]] = self.convert_time(f[13])
+            yield (int(f[0]), f[1], f[2], f[3], birth_date, f[5], f[6], f[7], f[8], f[9], f[10], f[11], int(f[12]), time_joined, f[14], f[15], f[16], f[17], f[18])
+
+
+class ClosingConnection:
+    # Wraps a DB-API connection whose connection and cursor objects can't be used as "with" blocks the way the other
+    # drivers' can (sqlite3 doesn't close on exit and has no cursor context manager).
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+        self.connection.close()
+
+    def __getattr__(self, item):
+        return getattr(self.connection, item)
+
+    def cursor(self):
+        return ClosingCursor(self.connection.cursor())
+
+
+class ClosingCursor:
+    # Cursor counterpart of ClosingConnection, closed at the end of a "with" block
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cursor.close()
+
+    def __getattr__(self, item):
+        return getattr(self.cursor, item)
+
+
+class PooledConnection:
+    # A connection kept open for the life of a process. Leaving a "with" block commits (or rolls back) and never closes
+    # it, whatever the driver's own connections do there (psycopg2's only end the transaction, mysql.connector's and
+    # cx_Oracle's close the connection).
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+
+    def __getattr__(self, item):
+        return getattr(self.connection, item)
+
+
+@register_backend
+class PostgreSQLBackend(Backend):
+    name = 'PostgreSQL'
+
+    set_date_format = '''SET datestyle = "ISO, DMY"'''
+
+    # Every numeric column of each view. pg_stat_wal needs 14 or later and pg_stat_io 16 or later
+    counter_queries = ["""SELECT 'pg_stat_database.' || key, value FROM pg_stat_database d, jsonb_each_text(to_jsonb(d)) AS j(key, value)
+                          WHERE datname = current_database() AND value ~ '^-?[0-9.]+$' AND key <> 'datid'""",
+                       """SELECT 'pg_stat_wal.' || key, value FROM pg_stat_wal w, jsonb_each_text(to_jsonb(w)) AS j(key, value) WHERE value ~ '^-?[0-9.]+$'""",
+                       """SELECT 'pg_stat_io.' || backend_type || '.' || key, sum(value::numeric) FROM pg_stat_io i, jsonb_each_text(to_jsonb(i) - 'op_bytes') AS j(key, value)
+                          WHERE value ~ '^-?[0-9.]+$' GROUP BY backend_type, key"""]
+
+    headline_counters = ['pg_stat_wal.wal_bytes', 'pg_stat_wal.wal_buffers_full', 'pg_stat_database.blks_read', 'pg_stat_database.blks_hit',
+                         'pg_stat_database.temp_bytes', 'pg_stat_database.deadlocks', 'pg_stat_io.checkpointer.writes', 'pg_stat_io.client backend.writes']
+
+    dml_strategies = {'executemany': 'insert_executemany', 'values': 'insert_values', 'prepared': 'insert_prepared', 'pipelined': 'insert_pipelined'}
+
+    insert_statement = f"insert into customers_test values ({', '.join(['%s'] * 19)})"
+
+    attach_pk = """ALTER TABLE customers_test ADD CONSTRAINT CUST_PK PRIMARY KEY USING INDEX CUST_PK"""
+
+    prepare_statement = f"PREPARE cust_insert AS insert into customers_test values ({', '.join(f'${i + 1}' for i in range(19))})"
+
+    execute_statement = f"EXECUTE cust_insert ({', '.join(['%s'] * 19)})"
+
+    def open_connection(self):
+        import psycopg2
+        return psycopg2.connect(f"host={self.hostname} dbname={self.database} user={self.username} password={self.password}")
+
+    def dml_cursor(self, connection, strategy):
+        cur = connection.cursor()
+        if strategy in ('prepared', 'pipelined'):
+            # Pooled connections may already have it prepared from an earlier load
+            cur.execute("DEALLOCATE ALL")
+            cur.execute(self.prepare_statement)
+        return cur
+
+    def parallel_index_statements(self, index, statement, degree):
+        # Parallel btree builds also need max_worker_processes and max_parallel_workers to allow for them
+        return [f"SET max_parallel_maintenance_workers = {degree}", statement]
+
+    def is_lock_error(self, exception):
+        # deadlock_detected, lock_not_available, serialization_failure
+        return getattr(exception, 'pgcode', None) in ('40P01', '55P03', '40001')
+
+    def lock_timeout_statements(self, seconds):
+        return [f"SET lock_timeout = '{int(seconds * 1000)}ms'"]
+
+    def reset_lock_timeout_statements(self):
+        return ["RESET lock_timeout"]
+
+    def insert_executemany(self, cur, batch):
+        # One round trip per row
+        cur.executemany(self.insert_statement, batch)
+
+    def insert_values(self, cur, batch):
+        # A single multi-row INSERT ... VALUES (...), (...) per batch
+        from psycopg2.extras import execute_values
+        execute_values(cur, "insert into customers_test values %s", batch, page_size=len(batch))
+
+    def insert_prepared(self, cur, batch):
+        # Server side prepared statement, one EXECUTE per row
+        cur.executemany(self.execute_statement, batch)
+
+    def insert_pipelined(self, cur, batch):
+        # psycopg2 has no libpq pipeline mode so send the whole batch of EXECUTEs for the prepared statement in one round trip
+        from psycopg2.extras import execute_batch
+        execute_batch(cur, self.execute_statement, batch, page_size=len(batch))
+
+    def load(self, file_details, loading_with_indexes, data_stream=None):
+        # data_stream is a GeneratedDataStream when running with --stream, otherwise read the datafile
+        with open(os.path.join(os.getcwd(), file_details[1]), 'r') if data_stream is None else contextlib.nullcontext(data_stream) as data_file:
+            with self.connect() as connection:
+                with connection.cursor() as cur:
+                    cur.execute(self.set_date_format)
+                    cur.copy_from(data_file, file_details[0], sep='|', size=1024 * 1024)
+                    connection.commit()
+                    # print(f"Loaded file {file_details[1]} with {file_details[2]} rows")
+
+
+@register_backend
+class MySQLBackend(Backend):
+    name = 'MySQL'
+    loads_from_pipe = True
+
+    dml_strategies = {'executemany': 'insert_executemany', 'values': 'insert_values', 'prepared': 'insert_prepared', 'pipelined': 'insert_pipelined'}
+
+    row_placeholders = f"({', '.join(['%s'] * 19)})"
+
+    # InnoDB's primary key is the clustered index, adding it rebuilds the table so it can't be attached afterwards
+    attach_pk = None
+
+    counter_queries = ["SHOW GLOBAL STATUS"]
+
+    headline_counters = ['Innodb_os_log_written', 'Innodb_data_written', 'Innodb_buffer_pool_reads', 'Innodb_buffer_pool_read_requests',
+                         'Innodb_buffer_pool_wait_free', 'Innodb_log_waits', 'Innodb_row_lock_time', 'Innodb_row_lock_waits']
+
+    insert_prefix = "insert into customers_test values "
+
+    insert_statement = insert_prefix + row_placeholders
+
+    def open_connection(self):
+        import mysql.connector
+        return mysql.connector.connect(user=self.username, password=self.password, host=self.hostname, database=self.database, allow_local_infile=True)
+
+    def dml_cursor(self, connection, strategy):
+        return connection.cursor(prepared=strategy == 'prepared')
+
+    def parallel_index_statements(self, index, statement, degree):
+        # innodb_ddl_threads needs 8.0.27 or later. Online DDL on the same table still serialises on its metadata lock
+        online = ", ALGORITHM=INPLACE, LOCK=NONE" if statement.startswith("ALTER") else " ALGORITHM=INPLACE LOCK=NONE"
+        return [f"SET SESSION innodb_ddl_threads = {degree}", f"SET SESSION innodb_parallel_read_threads = {degree}", statement + online]
+
+    def is_lock_error(self, exception):
+        # ER_LOCK_WAIT_TIMEOUT, ER_LOCK_DEADLOCK
+        return getattr(exception, 'errno', None) in (1205, 1213)
+
+    def lock_timeout_statements(self, seconds):
+        # Whole seconds, 1 at the least
+        return [f"SET SESSION innodb_lock_wait_timeout = {max(1, round(seconds))}"]
+
+    def reset_lock_timeout_statements(self):
+        return ["SET SESSION innodb_lock_wait_timeout = DEFAULT"]
+
+    def insert_executemany(self, cur, batch):
+        # Connector/Python rewrites executemany of a simple INSERT into multi-row INSERTs itself
+        cur.executemany(self.insert_statement, batch)
+
+    def insert_values(self, cur, batch):
+        # An explicit multi-row INSERT ... VALUES (...), (...) per batch
+        cur.execute(self.insert_prefix + ", ".join([self.row_placeholders] * len(batch)), [value for row in batch for value in row])
+
+    def insert_prepared(self, cur, batch):
+        # Server side prepared statement using the binary protocol, one execute per row
+        cur.executemany(self.insert_statement, batch)
+
+    def insert_pipelined(self, cur, batch):
+        # One single row INSERT per row, all sent as one multi statement round trip. Connector/Python 9.2 and later run
+        # multiple statements in execute() and every statement's result has to be read before the next batch
+        cur.execute(";".join([self.insert_statement] * len(batch)), [value for row in batch for value in row])
+        while cur.nextset():
+            pass
+
+    def load(self, file_details, loading_with_indexes, data_stream=None):
+        with self.connect() as connection:
+            with connection.cursor() as cur:
+                cur.execute(f"LOAD DATA LOCAL INFILE '{file_details[1]}' INTO TABLE {file_details[0].lower()} FIELDS TERMINATED BY '|'")
+                connection.commit()
+
+
+@register_backend
+class OracleBackend(Backend):
+    name = 'Oracle'
+    loads_from_pipe = True
+
+    dml_strategies = {'arraydml': 'insert_array'}
+
+    insert_statement = f"insert into CUSTOMERS_TEST ({','.join([col['ColumnName'] for col in Backend.customer_columns])}) values ({', '.join(f':{i + 1}' for i in range(len(Backend.customer_columns)))})"
+
+    drop_table = """drop table customers_test purge"""
+
+    warm_up_statement = """select 1 from dual"""
+
+    attach_pk = """ALTER TABLE customers_test ADD PRIMARY KEY (Id) USING INDEX CUST_PK"""
+
+    counter_queries = ["""select 'v$sysstat.' || name, value from v$sysstat""",
+                       """select 'v$system_event.' || event || '.time_waited_micro', time_waited_micro from v$system_event
+                          union all select 'v$system_event.' || event || '.total_waits', total_waits from v$system_event"""]
+
+    headline_counters = ['v$sysstat.redo size', 'v$sysstat.physical reads', 'v$sysstat.physical writes', 'v$sysstat.session logical reads',
+                         'v$system_event.log file sync.time_waited_micro', 'v$system_event.log buffer space.time_waited_micro',
+                         'v$system_event.enq: TX - row lock contention.time_waited_micro', 'v$system_event.db file sequential read.time_waited_micro']
+
+    table_definition = """create table customers_test(
                             Id number,
                             Email varchar(50),
                             Prefix varchar(50),
@@ -65,9 +780,6 @@ class TransactionBench:
                             Password varchar(50)
                             )"""
 
-    date_format = "DD-MM-YYYY"
-    timestamp_format = "HH24:mi:ss"
-
     control_file = """LOAD DATA APPEND INTO TABLE CUSTOMERS_TEST FIELDS TERMINATED BY "|"
                     (id,
                     email,
@@ -89,62 +801,500 @@ class TransactionBench:
                     bank,
                     password)"""
 
-    customer_columns = [
-        {"ColumnName": "id",
-         "DataType": "Number"},
-        {"ColumnName": "email",
-         "DataType": "String"},
-        {"ColumnName": "prefix",
-         "DataType": "String"},
-        {"ColumnName": "name",
-         "DataType": "String"},
-        {"ColumnName": "birth_date",
-         "DataType": "Date"},
-        {"ColumnName": "phone_number",
-         "DataType": "String"},
-        {"ColumnName": "additional_email",
-         "DataType": "String"},
-        {"ColumnName": "address",
-         "DataType": "String"},
-        {"ColumnName": "postcode",
-         "DataType": "String"},
-        {"ColumnName": "city",
-         "DataType": "String"},
-        {"ColumnName": "county",
-         "DataType": "String"},
-        {"ColumnName": "country",
-         "DataType": "String"},
-        {"ColumnName": "yearjoined",
-         "DataType": "Number"},
-        {"ColumnName": "timejoined",
-         "DataType": "Timestamp"},
-        {"ColumnName": "link",
-         "DataType": "String"},
-        {"ColumnName": "comments",
-         "DataType": "String"},
-        {"ColumnName": "occupation",
-         "DataType": "String"},
-        {"ColumnName": "bank",
-         "DataType": "String"},
-        {"ColumnName": "password",
-         "DataType": "String"}
-    ]
+    def open_connection(self):
+        import cx_Oracle
+        if self.connection_string is None:
+            return cx_Oracle.connect(self.username, self.password, f'//{self.hostname}/{self.database}')
+        else:
+            return cx_Oracle.connect(self.username, self.password, self.connection_string)
 
-    create_pk = """ALTER TABLE customers_test ADD PRIMARY KEY (Id)"""
+    def create_table(self, connection, cur):
+        try:
+            cur.execute(self.drop_table)
+            logging.debug(f"Statement executed : {self.drop_table}")
+        except Exception as e:
+            print(f"{Fore.LIGHTBLACK_EX}Table probably already existed : {e}{Fore.RESET}")
+        cur.execute(self.table_definition)
+        logging.debug(f"Statement executed : {self.table_definition}")
 
-    create_index_1 = """CREATE INDEX CUST_INDEX_1 ON customers_test(Email)"""
+    def load(self, file_details, loading_with_indexes, data_stream=None):
+        oh = os.getenv('ORACLE_HOME')
+        if oh is None:
+            oh = ""
+        else:
+            oh = oh + "/"
+        fd = file_details[1]
+        with open('t1.ctl', 'w') as cfd:
+            cfd.write(self.control_file)
+        cf = 't1.ctl'
+        if self.connection_string is None:
+            cs = f"//{self.hostname}/{self.database}"
+        else:
+            cs = self.connection_string
+        if loading_with_indexes:
+            direct_load_string = ''
+        else:
+            direct_load_string = 'direct=true'
+        sqlldr_command = f"{oh}sqlldr userid={self.username}/{self.password}@'{cs}' data={fd} control={os.path.join(os.getcwd())}/{cf} silent=all direct_path_lock_wait=true {direct_load_string} parallel=true"
+        result = subprocess.run([sqlldr_command], stdout=subprocess.PIPE, cwd=os.getcwd(), shell=True)
+        if self.debugging:
+            print(f"{Fore.LIGHTRED_EX}DEBUG:root:Statement executed : {sqlldr_command}{Fore.RESET}")
+        if result.returncode != 0:
+            print(f"Command failed run sqlldr command : {sqlldr_command}")
 
-    create_index_2 = """CREATE INDEX CUST_INDEX_2 ON customers_test(Birth_Date)"""
+    def bind_marker(self, position):
+        return f':{position}'
 
-    create_index_3 = """CREATE INDEX CUST_INDEX_3 ON customers_test(City)"""
+    def parallel_index_statements(self, index, statement, degree):
+        # Build with n parallel servers and no redo, then reset the degree so later queries and DML aren't parallelised
+        if index == 'Primary key':
+            index = 'CUST_PK'
+        if statement.startswith("ALTER"):
+            statement = f"ALTER TABLE customers_test ADD PRIMARY KEY (Id) USING INDEX (CREATE UNIQUE INDEX CUST_PK ON customers_test(Id) PARALLEL {degree} NOLOGGING)"
+        else:
+            statement = f"{statement} PARALLEL {degree} NOLOGGING"
+        return [statement, f"ALTER INDEX {index} NOPARALLEL"]
+
+    def is_lock_error(self, exception):
+        # ORA-00060 deadlock, ORA-00054 resource busy, ORA-30006 resource busy with WAIT timeout
+        return any(code in str(exception) for code in ('ORA-00060', 'ORA-00054', 'ORA-30006'))
+
+    def lock_chunk_statement(self, seconds):
+        # DML waits for row locks indefinitely, so the chunk's rows are locked first with a timeout (ORA-30006)
+        return f"SELECT Id FROM customers_test WHERE Occupation = 'Firefighter' AND Id >= :1 AND Id < :2 FOR UPDATE WAIT {max(1, round(seconds))}"
+
+    def convert_time(self, value):
+        # Timejoined is a TIMESTAMP and to_timestamp('HH24:mi:ss') puts the time on the first day of the current month
+        today = datetime.date.today()
+        return datetime.datetime(today.year, today.month, 1, int(value[0:2]), int(value[3:5]), int(value[6:8]))
+
+    def dml_cursor(self, connection, strategy):
+        import cx_Oracle
+        cur = connection.cursor()
+        cur.bindarraysize = self.dml_batch_size
+        bind_types = {"Number": cx_Oracle.NUMBER, "Date": cx_Oracle.DATETIME, "Timestamp": cx_Oracle.TIMESTAMP}
+        self.input_sizes = [c["Size"] if c["DataType"] == "String" else bind_types[c["DataType"]] for c in self.customer_columns]
+        return cur
+
+    def insert_array(self, cur, batch):
+        # Typed bind arrays, one round trip per batch
+        cur.setinputsizes(*self.input_sizes)
+        cur.executemany(self.insert_statement, batch)
+
+    def cleanup(self):
+        if os.path.isfile('t1.ctl'):
+            os.remove('t1.ctl')
+        if os.path.isfile('t1.log'):
+            os.remove('t1.log')
+
+
+@register_backend
+class SQLiteBackend(Backend):
+    # Local database file (-d, default batchtests.db) so the harness itself can be benchmarked without a server
+    name = 'SQLite'
+    requires_login = False
+
+    # SQLite can't add a primary key to an existing table, a unique index is the closest equivalent
+    create_pk = """CREATE UNIQUE INDEX CUST_PK ON customers_test(Id)"""
+
+    # Each build holds the single writer lock for its whole duration
+    concurrent_index_builds = False
+
+    dml_strategies = {'executemany': 'insert_executemany'}
+
+    insert_statement = f"insert into customers_test values ({', '.join(['?'] * 19)})"
+
+    def open_connection(self):
+        import sqlite3
+        # Parallel loaders serialise on SQLite's single writer lock so wait for it rather than failing
+        connection = sqlite3.connect(self.database or 'batchtests.db', timeout=3600, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return ClosingConnection(connection)
+
+    def load(self, file_details, loading_with_indexes, data_stream=None):
+        with self.open_data(file_details, data_stream) as data_file:
+            with self.connect() as connection:
+                with connection.cursor() as cur:
+                    rows = (line.rstrip(b"\n").decode('utf-8').split('|') for line in data_file)
+                    while True:
+                        batch = list(itertools.islice(rows, 10000))
+                        if not batch:
+                            break
+                        cur.executemany(self.insert_statement, batch)
+                connection.commit()
+
+    def bind_marker(self, position):
+        return '?'
+
+    def is_lock_error(self, exception):
+        return 'database is locked' in str(exception)
+
+    def lock_timeout_statements(self, seconds):
+        return [f"PRAGMA busy_timeout = {int(seconds * 1000)}"]
+
+    def reset_lock_timeout_statements(self):
+        # The timeout open_connection() sets
+        return ["PRAGMA busy_timeout = 3600000"]
+
+    def convert_date(self, value):
+        # Stored as text, the same as the bulk load path
+        return value
+
+    def convert_time(self, value):
+        return value
+
+    def insert_executemany(self, cur, batch):
+        cur.executemany(self.insert_statement, batch)
+
+
+@register_backend
+class NullBackend(Backend):
+    # Reads and discards every row. Measures the generator (and --stream plumbing) without any database in the way
+    name = 'Null'
+    requires_login = False
+
+    def open_connection(self):
+        return NullConnection()
+
+    def create_table(self, connection, cur):
+        pass
+
+    def load(self, file_details, loading_with_indexes, data_stream=None):
+        with self.open_data(file_details, data_stream) as data_file:
+            while data_file.read(1024 * 1024):
+                pass
+
+
+class NullConnection:
+    # Stands in for a connection and its cursors for the Null backend. Every statement is accepted and ignored
+    rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def cursor(self):
+        return self
+
+    def execute(self, statement, *args):
+        pass
+
+    def executemany(self, statement, rows):
+        pass
 
+    def fetchall(self):
+        return []
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ResultsCollector:
+    # Records each phase with perf_counter precision along with the rows, bytes and per worker timings behind it, and
+    # prints it in the usual style. Workers report perf_counter() values too (a system wide monotonic clock) which are
+    # stored relative to the start of their phase.
+
+    # compare() only flags a phase as a regression if it's slower by this fraction and by at least this many seconds
+    regression_threshold = 0.1
+    regression_min_seconds = 0.05
+
+    csv_headers = ['phase', 'key', 'worker', 'start', 'end', 'elapsed', 'rows', 'bytes', 'rows_per_sec', 'mb_per_sec']
+
+    def __init__(self, run_details, telemetry=None):
+        self.run_details = run_details
+        self.phases = []
+        self.current = None
+        self.telemetry = telemetry
+
+    @staticmethod
+    def format_time(seconds):
+        return f'{time.strftime("%H:%M:%S", time.gmtime(seconds))}.{int(seconds % 1 * 1000):03d}'
+
+    @contextlib.contextmanager
+    def phase(self, name, key=True):
+        # key phases are the ones that measure the database, and the only ones that count towards the total
+        phase = {'name': name, 'key': key, 'elapsed': None, 'rows': None, 'bytes': None, 'rows_per_sec': None, 'mb_per_sec': None, 'workers': []}
+        self.current = phase
+        # Telemetry is snapshotted outside the phase's timing
+        snapshot = self.telemetry.begin() if self.telemetry is not None else None
+        start = time.perf_counter()
+        yield phase
+        phase['elapsed'] = time.perf_counter() - start
+        if snapshot is not None:
+            phase.update(self.telemetry.end(snapshot))
+        self.current = None
+        for worker in phase['workers']:
+            worker['start'] -= start
+            worker['end'] -= start
+        if phase['rows'] is None and phase['workers']:
+            phase['rows'] = sum(w['rows'] for w in phase['workers'])
+        if phase['bytes'] is None and phase['workers'] and all(w['bytes'] is not None for w in phase['workers']):
+            phase['bytes'] = sum(w['bytes'] for w in phase['workers'])
+        if phase['rows']:
+            phase['rows_per_sec'] = phase['rows'] / max(phase['elapsed'], 1e-9)
+        if phase['bytes'] is not None:
+            phase['mb_per_sec'] = phase['bytes'] / 1048576 / max(phase['elapsed'], 1e-9)
+        self.phases.append(phase)
+        self.print_phase(phase)
+
+    def add_failures(self, errors):
+        # errors has each worker task's error, or None where it succeeded. A phase with failures keeps only the rows that
+        # were loaded and is marked as failed
+        failures = [e for e in errors if e is not None]
+        if failures and self.current is not None:
+            self.current['failed'] = self.current.get('failed', 0) + len(failures)
+            self.current.setdefault('errors', []).extend(failures)
+
+    def add_workers(self, results):
+        # results are [start, end, rows, bytes] lists, one per worker task, in perf_counter() time
+        if self.current is not None:
+            for start, end, rows, bytes_processed in results:
+                self.current['workers'].append({'worker': len(self.current['workers']) + 1, 'start': start, 'end': end, 'rows': rows, 'bytes': bytes_processed})
+
+    def print_phase(self, phase):
+        throughput = ''
+        if phase['rows_per_sec'] is not None:
+            throughput = f' ({phase["rows_per_sec"]:,.0f} rows/s' + (f', {phase["mb_per_sec"]:.1f} MB/s)' if phase['mb_per_sec'] is not None else ')')
+        if phase.get('failed'):
+            throughput += f'{Style.RESET_ALL}{Style.BRIGHT}{Fore.RED} FAILED in {phase["failed"]} workers : {phase["errors"][0]}'
+        if phase['key']:
+            print(f'{phase["name"]} in {Style.BRIGHT}{Fore.RED}{self.format_time(phase["elapsed"])}{Style.RESET_ALL}' + (f'{Fore.LIGHTBLACK_EX}{throughput}{Style.RESET_ALL}' if throughput else ''))
+        else:
+            print(f'{Fore.LIGHTBLACK_EX}{phase["name"]} in {self.format_time(phase["elapsed"])}{throughput}{Style.RESET_ALL}')
+        if len(phase['workers']) > 1:
+            ends = [w['end'] for w in phase['workers']]
+            slowest = max(phase['workers'], key=lambda w: w['end'])
+            print(f'{Fore.LIGHTBLACK_EX}  {len(ends)} workers finished between {min(ends):.3f}s and {max(ends):.3f}s, slowest was worker {slowest["worker"]} ({slowest["rows"]} rows){Style.RESET_ALL}')
+        if self.telemetry is not None:
+            self.telemetry.print_phase(phase)
+        for w in phase['workers']:
+            logging.debug(f"{phase['name']} worker {w['worker']} : started {w['start']:.3f}s, finished {w['end']:.3f}s, {w['rows']} rows")
+
+    def total_time(self):
+        return sum(p['elapsed'] for p in self.phases if p['key'])
+
+    def save(self, file_name):
+        if file_name.lower().endswith('.csv'):
+            with open(file_name, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.csv_headers)
+                writer.writeheader()
+                for p in self.phases:
+                    writer.writerow({'phase': p['name'], 'key': p['key'], 'worker': '', 'start': 0, 'end': p['elapsed'], 'elapsed': p['elapsed'], 'rows': p['rows'],
+                                     'bytes': p['bytes'], 'rows_per_sec': p['rows_per_sec'], 'mb_per_sec': p['mb_per_sec']})
+                    for w in p['workers']:
+                        writer.writerow({'phase': p['name'], 'key': p['key'], 'worker': w['worker'], 'start': w['start'], 'end': w['end'], 'elapsed': w['end'] - w['start'],
+                                         'rows': w['rows'], 'bytes': w['bytes']})
+        else:
+            with open(file_name, 'w') as f:
+                json.dump({'run': self.run_details, 'phases': self.phases, 'total': self.total_time()}, f, indent=2)
+
+    @staticmethod
+    def load_phases(file_name):
+        # Returns {phase name: (key, elapsed seconds)} from a file written by save(), or by MatrixRunner.save() in which
+        # case each phase is named with its scale and thread count and its elapsed time is the median of its runs
+        if file_name.lower().endswith('.csv'):
+            with open(file_name, newline='') as f:
+                rows = list(csv.DictReader(f))
+            if rows and 'scale' in rows[0]:
+                return {ResultsCollector.matrix_phase_name(r): (r['key'] == 'True', float(r['median'])) for r in rows}
+            return {r['phase']: (r['key'] == 'True', float(r['elapsed'])) for r in rows if r['worker'] == ''}
+        with open(file_name) as f:
+            results = json.load(f)
+        if 'matrix' in results:
+            return {ResultsCollector.matrix_phase_name(r): (r['key'], r['median']) for r in results['matrix']}
+        return {p['name']: (p['key'], p['elapsed']) for p in results['phases']}
+
+    @staticmethod
+    def matrix_phase_name(row):
+        # The same name whether the scale and threads came from JSON numbers or CSV strings
+        return f"{row['phase']} (scale {float(row['scale']):g}, {int(row['threads'])} threads)"
+
+    @staticmethod
+    def compare(base_file, new_file):
+        # Prints each phase's time in both files and flags the ones that got slower. Returns the number of key phases that regressed
+        base = ResultsCollector.load_phases(base_file)
+        new = ResultsCollector.load_phases(new_file)
+        regressions = 0
+        width = max([60] + [len(name) + 2 for name in list(base) + list(new)])
+        print(f"{'Phase':<{width}}{'Base':>14}{'New':>14}{'Change':>10}")
+        for name in list(base) + [n for n in new if n not in base]:
+            if name not in base or name not in new:
+                print(f"{Fore.LIGHTBLACK_EX}{name:<{width}}{'only in ' + (base_file if name in base else new_file)}{Style.RESET_ALL}")
+                continue
+            key, base_elapsed = base[name]
+            new_elapsed = new[name][1]
+            change = (new_elapsed - base_elapsed) / base_elapsed if base_elapsed > 0 else 0.0
+            line = f"{name:<{width}}{ResultsCollector.format_time(base_elapsed):>14}{ResultsCollector.format_time(new_elapsed):>14}{change:>+10.1%}"
+            if change > ResultsCollector.regression_threshold and new_elapsed - base_elapsed > ResultsCollector.regression_min_seconds:
+                print(f"{Style.BRIGHT}{Fore.RED}{line} REGRESSION{Style.RESET_ALL}")
+                regressions += 1 if key else 0
+            elif change < -ResultsCollector.regression_threshold and base_elapsed - new_elapsed > ResultsCollector.regression_min_seconds:
+                print(f"{Fore.GREEN}{line}{Style.RESET_ALL}")
+            elif key:
+                print(line)
+            else:
+                print(f"{Fore.LIGHTBLACK_EX}{line}{Style.RESET_ALL}")
+        return regressions
+
+
+class LatencyHistogram:
+    # HDR style log-linear histogram of latencies in microseconds. Each power of two range is split into 64 linear
+    # buckets, so every value is kept to within ~1.6% whatever its magnitude, recording is O(1) and memory stays
+    # bounded however many operations are recorded.
+    sub_bucket_bits = 7
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.max = 0
+
+    def record(self, seconds):
+        value = max(int(seconds * 1000000), 0)
+        shift = max(value.bit_length() - self.sub_bucket_bits, 0)
+        bucket = (shift, value >> shift)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile):
+        # Highest value equivalent to the bucket holding the percentile, in milliseconds
+        target = max(math.ceil(self.total * percentile / 100), 1)
+        seen = 0
+        for shift, sub_bucket in sorted(self.counts):
+            seen += self.counts[(shift, sub_bucket)]
+            if seen >= target:
+                return min(((sub_bucket + 1) << shift) - 1, self.max) / 1000
+        return self.max / 1000
+
+    def summary(self):
+        return {'count': self.total, 'p50': self.percentile(50), 'p95': self.percentile(95), 'p99': self.percentile(99),
+                'p99.9': self.percentile(99.9), 'max': self.max / 1000}
+
+
+class Telemetry:
+    # --servercounters. Snapshots the server's counters (Backend.counter_queries) on a connection of its own before and
+    # after each phase and keeps the ones that changed, and samples the client machine's CPU use and disk writes from a
+    # background thread so each phase also gets their average and peak. Client sampling needs Linux's /proc.
+
+    def __init__(self, backend, sample_interval):
+        self.backend = backend
+        self.connection = backend.open_connection() if backend.counter_queries else None
+        self.sample_interval = sample_interval
+        self.samples = []
+        self.stopped = threading.Event()
+        self.sampler = None
+        if self.client_counters() is not None:
+            self.sampler = threading.Thread(target=self.sample, daemon=True)
+            self.sampler.start()
+
+    @staticmethod
+    def client_counters():
+        # [time, busy CPU ticks, total CPU ticks, bytes written to disk] for the whole client machine, or None
+        try:
+            with open('/proc/stat') as stat:
+                ticks = [int(t) for t in stat.readline().split()[1:9]]
+            disks = [d for d in os.listdir('/sys/block') if not d.startswith(('loop', 'ram', 'zram', 'dm-', 'md'))]
+            with open('/proc/diskstats') as diskstats:
+                written = sum(int(fields[9]) * 512 for fields in (line.split() for line in diskstats) if fields[2] in disks)
+            return [time.perf_counter(), sum(ticks) - ticks[3] - ticks[4], sum(ticks), written]
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def sample(self):
+        while not self.stopped.wait(self.sample_interval):
+            self.samples.append(self.client_counters())
+
+    def begin(self):
+        return [self.backend.server_counters(self.connection) if self.connection is not None else {}, len(self.samples), self.client_counters()]
+
+    def end(self, snapshot):
+        counters, first_sample, client = snapshot
+        telemetry = {}
+        if self.connection is not None:
+            after = self.backend.server_counters(self.connection)
+            telemetry['server_counters'] = {name: after[name] - value for name, value in counters.items() if name in after and after[name] != value}
+        if client is not None:
+            samples = [client] + self.samples[first_sample:] + [self.client_counters()]
+            rates = [self.client_rates(before, after) for before, after in zip(samples, samples[1:])]
+            cpu, write_mb = self.client_rates(samples[0], samples[-1])
+            telemetry['client'] = {'cpu_percent': cpu, 'cpu_percent_peak': max(r[0] for r in rates),
+                                   'disk_write_mb_per_sec': write_mb, 'disk_write_mb_per_sec_peak': max(r[1] for r in rates)}
+        return telemetry
+
+    @staticmethod
+    def client_rates(before, after):
+        # CPU busy as a percentage of every CPU, and MB/s written to disk, between two client_counters() readings
+        cpu = (after[1] - before[1]) / max(after[2] - before[2], 1) * 100
+        return [cpu, (after[3] - before[3]) / 1048576 / max(after[0] - before[0], 1e-9)]
+
+    def print_phase(self, phase):
+        if 'client' in phase:
+            client = phase['client']
+            print(f"{Fore.LIGHTBLACK_EX}  client CPU {client['cpu_percent']:.0f}% (peak {client['cpu_percent_peak']:.0f}%), disk writes {client['disk_write_mb_per_sec']:.1f} MB/s "
+                  f"(peak {client['disk_write_mb_per_sec_peak']:.1f} MB/s){Style.RESET_ALL}")
+        if 'server_counters' in phase:
+            headlines = [f"{name.split('.', 1)[-1]} {phase['server_counters'][name]:,.0f}" for name in self.backend.headline_counters if name in phase['server_counters']]
+            print(f"{Fore.LIGHTBLACK_EX}  server {', '.join(headlines) if headlines else 'no headline counters changed'} "
+                  f"({len(phase['server_counters'])} counters changed){Style.RESET_ALL}")
+            for name, delta in sorted(phase['server_counters'].items()):
+                logging.debug(f"{phase['name']} {name} : {delta:,.0f}")
+
+    def close(self):
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.join()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class TransactionBench:
     update_statement = """UPDATE customers_test set Comments = 'Ive been updated' WHERE Occupation = 'Firefighter'"""
 
     select_statement = """select count(1) from customers_test where county in ('Surrey', 'Shropshire')"""
 
-    set_date_format = '''SET datestyle = "ISO, DMY"'''
+    parallel_update_statement = """UPDATE customers_test set Comments = {0} WHERE Occupation = 'Firefighter' AND Id >= {1} AND Id < {2}"""
+
+    # Retries of a chunk that hit a lock timeout or deadlock before the parallel update gives up
+    update_max_retries = 100
+
+    # Seconds a parallel update waits for a row lock before the chunk is rolled back and retried
+    update_lock_timeout = 1.0
+
+    # Statements for the OLTP phase (--oltp). {0}, {1} are replaced by the backend's bind markers
+    oltp_statements = {
+        'pk': """select * from customers_test where Id = {0}""",
+        'email': """select * from customers_test where Email = {0}""",
+        'city': """select * from customers_test where City = {0}""",
+        'birthdate': """select * from customers_test where Birth_Date = {0}""",
+        'update': """UPDATE customers_test set Comments = {0} WHERE Id = {1}"""
+    }
+
+    seed_headers = ["Id", "EmailId", "Prefix", "CustomerName", "BirthDate", "PhoneNumber", "AdditionalEmailId", "Address", "ZipCode", "City", "State", "Country", "YearJoined", "TimeJoined", "Link", "CustomerComments", "Occupation", "Bank", "Password"]
+
+    seed_locale = 'en_GB'
+
+    # Seed rows generated by each Faker instance when the seed pool isn't already cached
+    seed_chunk_size = 5000
+
+    # Number of rows assembled in memory and written with a single write() call
+    generation_block_size = 20000
 
-    # Probably don't need to make this a class. Everything is done in the init method.... but just in case.
 
     def __init__(self, args):
         if args.debug:
@@ -156,126 +1306,494 @@ class TransactionBench:
             logger.disabled = True
             self.debugging = False
 
-        self.username = args.user
-        self.password = args.password
-        self.hostname = args.hostname
-        self.database = args.database
         self.target = args.target
-        self.connection_string = args.connectionstring
+        self.backend = backends[args.target](args)
         self.size = args.size
         self.threads = args.threads
-        self.seed_data = []
-        self.seed_data_size = 10000
+        self.seed_pool = None
+        self.seed_data_size = args.seeddatasize
+        self.seed = args.seed
+        self.seed_cache_dir = args.seedcache
         self.delete_gen_file = not args.dontdelete
-        self.use_dml_to_load = args.dmlload
+        self.stream = args.stream
+        self.compress = args.compress
+        self.datafile_prefix = 'People_data'
+        self.chunk_size = args.chunksize
+        self.queue_depth = args.queuedepth or self.threads * 2
+        self.datafile_suffix = 'csv' + compression_suffixes.get(args.compress, '')
+        self.results_file = args.resultsfile
+        self.authkey = args.authkey.encode() if args.authkey else None
+        self.connection_pool = args.connectionpool
+        self.parallel_indexes = args.parallelindexes
+        self.parallel_update = args.parallelupdate
+        self.update_workers = [int(w) for w in args.updateworkers.split(',')] if args.updateworkers else [args.threads]
+        self.update_chunks = [int(c) for c in args.updatechunks.split(',')]
+        self.oltp = args.oltp
+        self.oltp_sessions = args.oltpsessions or args.threads
+        self.oltp_duration = args.oltpduration
+        self.oltp_operations = args.oltpops
+        self.oltp_mix = {op: float(weight) for op, weight in (item.split('=') for item in args.oltpmix.split(','))}
+        self.warm_up = args.warmup
+        self.executor = None
+        self.loader_executor = None
+
+        self.telemetry = Telemetry(self.backend, args.sampleinterval) if args.servercounters else None
+        self.results = ResultsCollector({'target': self.target, 'size': self.size, 'threads': self.threads, 'stream': self.stream,
+                                         'seed_data_size': self.seed_data_size, 'started': datetime.datetime.now().isoformat(timespec='seconds')},
+                                        self.telemetry)
 
+    def run_tests(self):
         records = int(3342227 * self.size)
-        file_name = f'People_data_1_{records}.csv'
-        total_time = 0
-
-        start = time.time()
-        # I'm rounding everything up to seconds. This is supposed to be a long running test and microseconds is likely a rounding error
-        self.generate_seed_data()
-        print(f'{Fore.LIGHTBLACK_EX}Generated seed data in {time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        start = time.time()
-        all_files = self.generate_parallel(0)
-        print(f'{Fore.LIGHTBLACK_EX}Written serial datafile to filesystem in {time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        start = time.time()
-        if len(all_files) > 1:
-            all_files = self.concat_files(file_name, records, all_files)
-        print(f'{Fore.LIGHTBLACK_EX}Concated files in {time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        start = time.time()
-        self.create_table()
-        print(f'{Fore.LIGHTBLACK_EX}Created table in {time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        start = time.time()
-        self.load_data(all_files, False)
-        total_time += (time.time() - start)
-        print(f'Loaded data to database serially in {Style.BRIGHT}{Fore.RED}{time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        self.delete_files(all_files)
-        start = time.time()
-        all_files = self.generate_parallel(records + 1)
-        print(f'{Fore.LIGHTBLACK_EX}Written parallel datafiles to filesystem in {time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        start = time.time()
-        self.load_data(all_files, False)
-        total_time += (time.time() - start)
-        print(f'Loaded data to database in parallel in {Style.BRIGHT}{Fore.RED}{time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        self.delete_files(all_files)
-        start = time.time()
-        self.create_indexes()
-        total_time += (time.time() - start)
-        print(f'Created indexes in {Style.BRIGHT}{Fore.RED}{time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        start = time.time()
-        all_files = self.generate_parallel(records * 2 + 1)
-        print(f'{Fore.LIGHTBLACK_EX}Written parallel datafiles to filesystem in {time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        start = time.time()
-        self.load_data(all_files, True)
-        total_time += (time.time() - start)
-        print(f'Loaded data to database in parallel in with indexes {Style.BRIGHT}{Fore.RED}{time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
+        file_name = f'{self.datafile_prefix}_1_{records}.{self.datafile_suffix}'
+
+        with self.results.phase('Generated seed data', key=False):
+            self.generate_seed_data()
+        if self.connection_pool:
+            with self.results.phase('Established pooled connections', key=False):
+                self.open_connection_pool()
+        if self.stream:
+            print(f'{Fore.LIGHTBLACK_EX}Streaming generated data directly into the loader (no datafiles){Style.RESET_ALL}')
+            with self.results.phase('Created table', key=False):
+                self.create_table()
+            with self.results.phase('Loaded data to database serially'):
+                self.stream_data(0, False, 1)
+            with self.results.phase('Loaded data to database in parallel'):
+                self.stream_data(records + 1, False, self.threads)
+        else:
+            if self.chunk_size:
+                self.loader_pool()
+            with self.results.phase('Written serial datafile to filesystem', key=False):
+                all_files = self.generate_parallel(0)
+            with self.results.phase('Concated files', key=False):
+                if len(all_files) > 1:
+                    all_files = self.concat_files(file_name, records, all_files)
+            with self.results.phase('Created table', key=False):
+                self.create_table()
+            with self.results.phase('Loaded data to database serially'):
+                self.load_data(all_files, False)
+            self.delete_files(all_files)
+            if self.chunk_size:
+                with self.results.phase('Generated and loaded data to database in parallel in chunks') as phase:
+                    self.generate_and_load(phase, records + 1, records, False)
+            else:
+                with self.results.phase('Written parallel datafiles to filesystem', key=False):
+                    all_files = self.generate_parallel(records + 1)
+                with self.results.phase('Loaded data to database in parallel'):
+                    self.load_data(all_files, False)
+                self.delete_files(all_files)
+        with self.results.phase('Created indexes') as phase:
+            phase_start = time.perf_counter()
+            index_timings = self.create_indexes()
+        self.report_index_timings(phase, index_timings, phase_start)
+        if self.stream:
+            with self.results.phase('Loaded data to database in parallel with indexes'):
+                self.stream_data(records * 2 + 1, True, self.threads)
+        elif self.chunk_size:
+            with self.results.phase('Generated and loaded data to database in parallel in chunks with indexes') as phase:
+                self.generate_and_load(phase, records * 2 + 1, records, True)
+        else:
+            with self.results.phase('Written parallel datafiles to filesystem for indexed load', key=False):
+                all_files = self.generate_parallel(records * 2 + 1)
+            with self.results.phase('Loaded data to database in parallel with indexes'):
+                self.load_data(all_files, True)
+            self.delete_files(all_files)
+        with self.results.phase('Updated rows') as phase:
+            phase['rows'] = self.update_data()
+        with self.results.phase('Scanned Data'):
+            self.scan_data()
+        if self.parallel_update:
+            self.run_update_sweep(records * 3)
+        if self.oltp:
+            with self.results.phase('Ran OLTP sessions', key=False) as phase:
+                self.run_oltp(phase, records * 3)
+        print(f"Total time taken for key tests {Style.BRIGHT}{Fore.RED}{ResultsCollector.format_time(self.results.total_time())}{Style.RESET_ALL}")
+        if self.results_file is not None:
+            self.results.save(self.results_file)
+            print(f"{Fore.LIGHTBLACK_EX}Results written to {self.results_file}{Style.RESET_ALL}")
+
+    def run_coordinator(self, address, clients):
+        # --coordinator. Waits for --clients clients (--client, on this host or others) to connect and then runs the tests
+        # with each load phase's Ids split between them, one contiguous range each, while it creates the table and
+        # indexes and runs the update and scan itself. Every client's workers are aggregated into the phase
+        records = int(3342227 * self.size)
+        with Listener(address, authkey=self.authkey) as listener:
+            print(f"{Fore.LIGHTBLACK_EX}Waiting for {clients} clients on {address[0]}:{address[1]}{Style.RESET_ALL}")
+            connections = []
+            settings = self.client_settings()
+            while len(connections) < clients:
+                connection = listener.accept()
+                client = connection.recv()
+                # Clients with other settings would generate different rows for the same Ids, so they're turned away
+                mismatched = [f"{name} {client['settings'].get(name)} (coordinator {value})" for name, value in settings.items()
+                              if client['settings'].get(name) != value]
+                if mismatched:
+                    print(f"{Style.BRIGHT}{Fore.RED}Rejected client {client['host']} (pid {client['pid']}) with {', '.join(mismatched)}{Style.RESET_ALL}")
+                    connection.send({'rejected': ', '.join(mismatched)})
+                    connection.close()
+                    continue
+                print(f"{Fore.LIGHTBLACK_EX}Client {client['host']} (pid {client['pid']}) connected with {client['threads']} threads{Style.RESET_ALL}")
+                connections.append(connection)
+            try:
+                with self.results.phase('Created table', key=False):
+                    self.create_table()
+                self.run_client_phases(connections, 0, records, False)
+                with self.results.phase('Created indexes') as phase:
+                    phase_start = time.perf_counter()
+                    index_timings = self.create_indexes()
+                self.report_index_timings(phase, index_timings, phase_start)
+                self.run_client_phases(connections, records, records, True)
+                with self.results.phase('Updated rows') as phase:
+                    phase['rows'] = self.update_data()
+                with self.results.phase('Scanned Data'):
+                    self.scan_data()
+            finally:
+                for connection in connections:
+                    connection.send(None)
+                    connection.close()
+        print(f"Total time taken for key tests {Style.BRIGHT}{Fore.RED}{ResultsCollector.format_time(self.results.total_time())}{Style.RESET_ALL}")
+        if self.results_file is not None:
+            self.results.save(self.results_file)
+            print(f"{Fore.LIGHTBLACK_EX}Results written to {self.results_file}{Style.RESET_ALL}")
+
+    def run_client_phases(self, connections, starting_id, records, loading_with_indexes):
+        # The same load phases as run_tests, in whichever mode (--stream, --chunksize or datafiles) the coordinator was given
+        clients = f'{len(connections)} clients' + (' with indexes' if loading_with_indexes else '')
+        if self.stream:
+            self.client_phase(connections, 'stream', f'Loaded data to database in parallel from {clients}', True, starting_id, records, loading_with_indexes)
+        elif self.chunk_size:
+            self.client_phase(connections, 'chunks', f'Generated and loaded data to database in parallel in chunks from {clients}', True, starting_id, records, loading_with_indexes)
+        else:
+            self.client_phase(connections, 'generate', f'Written parallel datafiles to filesystem on {clients}', False, starting_id, records, loading_with_indexes)
+            self.client_phase(connections, 'load', f'Loaded data to database in parallel from {clients}', True, starting_id, records, loading_with_indexes)
+
+    def client_phase(self, connections, action, name, key, starting_id, records, loading_with_indexes):
+        # Client workers report times relative to when the client started the phase, which is taken to be when it was sent
+        shards = [[starting_id + records * c // len(connections), starting_id + records * (c + 1) // len(connections)] for c in range(len(connections))]
+        with self.results.phase(name, key) as phase:
+            sent = time.perf_counter()
+            for connection, (first_id, last_id) in zip(connections, shards):
+                connection.send({'action': action, 'phase': name, 'key': key, 'first_id': first_id, 'rows': last_id - first_id,
+                                 'loading_with_indexes': loading_with_indexes})
+            replies = [connection.recv() for connection in connections]
+            self.results.add_workers([[sent + start, sent + end, rows, bytes_processed] for reply in replies for start, end, rows, bytes_processed in reply['workers']])
+        phase['clients'] = replies
+        for reply in replies:
+            print(f"{Fore.LIGHTBLACK_EX}  {reply['host']} (pid {reply['pid']}) {reply['rows']} rows in {ResultsCollector.format_time(reply['elapsed'])}{Style.RESET_ALL}")
+
+    def client_settings(self):
+        # The settings a client has to share with its coordinator, by option name
+        return {'--seed': self.seed, '--seeddatasize': self.seed_data_size, '--size': self.size, '--chunksize': self.chunk_size}
+
+    def run_client(self, address):
+        # --client. Runs whatever phases the coordinator sends over its own -tc worker processes and reports back each
+        # phase's workers, until the coordinator is done. The seed data and generation are deterministic for a given
+        # --seed, so clients all generate the same rows for the Ids they're given
+        self.datafile_prefix = f'People_data_{os.getpid()}'
+        with self.results.phase('Generated seed data', key=False):
+            self.generate_seed_data()
+        if self.connection_pool:
+            with self.results.phase('Established pooled connections', key=False):
+                self.open_connection_pool()
+        all_files = []
+        rejected = False
+        with Client(address, authkey=self.authkey) as coordinator:
+            coordinator.send({'host': socket.gethostname(), 'pid': os.getpid(), 'threads': self.threads, 'settings': self.client_settings()})
+            while (job := coordinator.recv()) is not None:
+                if 'rejected' in job:
+                    print(f"{Style.BRIGHT}{Fore.RED}Rejected by the coordinator for a different {job['rejected']}{Style.RESET_ALL}")
+                    rejected = True
+                    break
+                if self.chunk_size:
+                    self.loader_pool()
+                with self.results.phase(job['phase'], job['key']) as phase:
+                    if job['action'] == 'generate':
+                        all_files = self.generate_parallel(job['first_id'], job['rows'])
+                    elif job['action'] == 'load':
+                        self.load_data(all_files, job['loading_with_indexes'])
+                    elif job['action'] == 'stream':
+                        self.stream_data(job['first_id'], job['loading_with_indexes'], self.threads, job['rows'])
+                    else:
+                        self.generate_and_load(phase, job['first_id'], job['rows'], job['loading_with_indexes'])
+                if job['action'] == 'load':
+                    self.delete_files(all_files)
+                coordinator.send({'host': socket.gethostname(), 'pid': os.getpid(), 'elapsed': phase['elapsed'], 'rows': phase['rows'],
+                                  'workers': [[w['start'], w['end'], w['rows'], w['bytes']] for w in phase['workers']]})
+        self.shutdown()
+        return not rejected
+
+    def run_dml_sweep(self, batch_sizes, strategies):
+        # Loads the same datafiles with the bulk loader and then once per DML strategy and array size (table recreated each
+        # time) so the gap between them, and the best batch size for the network, can be measured
+        with self.results.phase('Generated seed data', key=False):
+            self.generate_seed_data()
+        if self.connection_pool:
+            with self.results.phase('Established pooled connections', key=False):
+                self.open_connection_pool()
+        with self.results.phase('Written parallel datafiles to filesystem', key=False):
+            all_files = self.generate_parallel(0)
+        with self.results.phase('Created table for bulk load', key=False):
+            self.create_table()
+        self.backend.use_dml_to_load = False
+        with self.results.phase('Loaded data to database with bulk loader') as phase:
+            self.load_data(all_files, False)
+        sweep = [['bulk loader', '', phase['rows_per_sec'], phase.get('failed')]]
+        self.backend.use_dml_to_load = True
+        for strategy in strategies:
+            self.backend.dml_strategy = strategy
+            for batch_size in batch_sizes:
+                self.backend.dml_batch_size = batch_size
+                with self.results.phase(f'Created table for DML {strategy} batch size {batch_size}', key=False):
+                    self.create_table()
+                with self.results.phase(f'Loaded data to database with DML {strategy} batch size {batch_size}') as phase:
+                    self.load_data(all_files, False)
+                sweep.append([strategy, batch_size, phase['rows_per_sec'], phase.get('failed')])
         self.delete_files(all_files)
-        start = time.time()
-        self.update_data()
-        total_time += (time.time() - start)
-        print(f'Updated rows in {Style.BRIGHT}{Fore.RED}{time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        start = time.time()
-        self.scan_data()
-        total_time += (time.time() - start)
-        time_delta = timedelta(seconds=total_time)
-        print(f'Scanned Data in {Style.BRIGHT}{Fore.RED}{time.strftime("%H:%M:%S", time.gmtime(time.time() - start))}{Style.RESET_ALL}')
-        print(f"Total time taken for key tests {Style.BRIGHT}{Fore.RED}{str(time_delta).split('.')[0]}{Style.RESET_ALL}")
+        # Configurations that failed, in any worker, are reported as such and can't be the best
+        succeeded = [s for s in sweep[1:] if not s[3]]
+        best = max(succeeded, key=lambda s: s[2]) if succeeded else None
+        for strategy, batch_size, rows_per_sec, failed in sweep:
+            if failed:
+                print(f'{strategy:<12} {batch_size:>8} : {Style.BRIGHT}{Fore.RED}failed{Style.RESET_ALL}')
+                continue
+            colour = f'{Style.BRIGHT}{Fore.RED}' if best is not None and [strategy, batch_size] == best[:2] else ''
+            relative = f' {rows_per_sec / sweep[0][2]:>7.1%} of bulk loader' if not sweep[0][3] else ''
+            print(f'{colour}{strategy:<12} {batch_size:>8} : {rows_per_sec:>12,.0f} rows/s{relative}{Style.RESET_ALL}')
+        if self.results_file is not None:
+            self.results.save(self.results_file)
+            print(f"{Fore.LIGHTBLACK_EX}Results written to {self.results_file}{Style.RESET_ALL}")
+
+    def run_oltp(self, phase, max_id):
+        # Concurrent point lookups and single row updates against the indexed table, driven by asyncio. The drivers are
+        # blocking so each session runs its statements on its own thread (and its own connection) while the event loop
+        # schedules the sessions, enforces the time or operation limit and collects the latencies.
+        sample = random.Random(self.seed).sample(range(len(self.seed_pool)), min(1000, len(self.seed_pool)))
+        seed_values = [bytes(self.seed_pool.blob[self.seed_pool.offsets[i]:self.seed_pool.offsets[i + 1]]).decode('utf-8').split('|') for i in sample]
+        lookups = {'email': [v[1] for v in seed_values], 'city': [v[9] for v in seed_values], 'birthdate': [self.backend.convert_date(v[4]) for v in seed_values]}
+        statements = {op: sql.format(self.backend.bind_marker(1), self.backend.bind_marker(2)) for op, sql in self.oltp_statements.items()}
+        histograms, elapsed = asyncio.run(self.oltp_sessions_task(statements, lookups, max_id))
+        overall = LatencyHistogram()
+        phase['latency'] = {}
+        for op in self.oltp_mix:
+            histogram = LatencyHistogram()
+            for session in histograms:
+                histogram.merge(session[op])
+            overall.merge(histogram)
+            phase['latency'][op] = histogram.summary()
+        phase['latency']['all'] = overall.summary()
+        phase['rows'] = overall.total
+        print(f"OLTP {self.oltp_sessions} sessions ran {overall.total:,} operations at {Style.BRIGHT}{Fore.RED}{overall.total / elapsed:,.0f} ops/s{Style.RESET_ALL}")
+        for op, summary in phase['latency'].items():
+            print(f"{Fore.LIGHTBLACK_EX}  {op:<10}{summary['count']:>10,} ops  p50 {summary['p50']:.2f}ms  p95 {summary['p95']:.2f}ms  p99 {summary['p99']:.2f}ms  "
+                  f"p99.9 {summary['p99.9']:.2f}ms  max {summary['max']:.2f}ms{Style.RESET_ALL}")
+
+    async def oltp_sessions_task(self, statements, lookups, max_id):
+        loop = asyncio.get_running_loop()
+        executors = [ThreadPoolExecutor(max_workers=1) for _ in range(self.oltp_sessions)]
+        # Connect every session before the clock starts
+        connections = await asyncio.gather(*[loop.run_in_executor(e, self.backend.open_connection) for e in executors])
+        started = time.perf_counter()
+        deadline = started + self.oltp_duration
+        remaining = [self.oltp_operations]
+
+        def more_work():
+            if remaining[0] is None:
+                return time.perf_counter() < deadline
+            remaining[0] -= 1
+            return remaining[0] >= 0
+
+        async def session(number, executor, connection):
+            histograms = {op: LatencyHistogram() for op in self.oltp_mix}
+            rng = random.Random(self.seed * 1000003 + number)
+            ops = list(self.oltp_mix)
+            weights = [self.oltp_mix[op] for op in ops]
+            cur = await loop.run_in_executor(executor, connection.cursor)
+            while more_work():
+                op = rng.choices(ops, weights)[0]
+                if op == 'pk':
+                    params = [rng.randint(0, max_id)]
+                elif op == 'update':
+                    params = [f'Updated by session {number}', rng.randint(0, max_id)]
+                else:
+                    params = [rng.choice(lookups[op])]
+                histograms[op].record(await loop.run_in_executor(executor, self.oltp_operation, connection, cur, statements[op], params, op == 'update'))
+            await loop.run_in_executor(executor, cur.close)
+            await loop.run_in_executor(executor, connection.close)
+            return histograms
+
+        try:
+            histograms = await asyncio.gather(*[session(n, e, c) for n, (e, c) in enumerate(zip(executors, connections))])
+            return histograms, time.perf_counter() - started
+        finally:
+            for executor in executors:
+                executor.shutdown()
+
+    @staticmethod
+    def oltp_operation(connection, cur, statement, params, is_update):
+        # Runs on the session's own thread. Returns the statement's latency including its commit
+        start = time.perf_counter()
+        cur.execute(statement, params)
+        if not is_update:
+            cur.fetchall()
+        connection.commit()
+        return time.perf_counter() - start
 
     @staticmethod
     def concat_files(target_file, row_count, all_files, delete_orginals=True):
+        # Row lengths vary so the offset of each worker's chunk isn't known until it has been written. Once it has, size the
+        # target file up front and copy every chunk into its slot concurrently with copy_file_range, which keeps the copy
+        # inside the kernel (and is close to free on filesystems that support reflinks).
+        source_files = [file[1] for file in all_files]
+        offsets = [0]
+        for f in source_files:
+            offsets.append(offsets[-1] + os.path.getsize(f))
         with open(target_file, 'wb') as wfd:
-            for f in [file[1] for file in all_files]:
-                with open(f, 'rb') as fd:
-                    shutil.copyfileobj(fd, wfd)
+            wfd.truncate(offsets[-1])
+        with ThreadPoolExecutor(max_workers=len(source_files)) as executor:
+            list(executor.map(TransactionBench.copy_into, source_files, [target_file] * len(source_files), offsets[:-1]))
         if delete_orginals:
-            for f in [file[1] for file in all_files]:
+            for f in source_files:
                 os.remove(f)
         return [[all_files[0][0], target_file, row_count]]
 
+    @staticmethod
+    def copy_into(source_file, target_file, offset):
+        with open(source_file, 'rb') as src, open(target_file, 'r+b') as dst:
+            remaining = os.fstat(src.fileno()).st_size
+            source_offset = 0
+            while remaining > 0:
+                try:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining, source_offset, offset + source_offset)
+                except (AttributeError, OSError):
+                    # Not Linux, or the filesystem doesn't support it. Fall back to positional reads and writes
+                    copied = os.pwrite(dst.fileno(), os.pread(src.fileno(), min(remaining, 16 * 1024 * 1024), source_offset), offset + source_offset)
+                if copied == 0:
+                    break
+                source_offset += copied
+                remaining -= copied
+
     def delete_files(self, all_files):
         if self.delete_gen_file:
             for f in [file[1] for file in all_files]:
                 os.remove(f)
-            if self.target == 'Oracle':
-                if os.path.isfile('t1.ctl'):
-                    os.remove('t1.ctl')
-                if os.path.isfile('t1.log'):
-                    os.remove('t1.log')
+            self.backend.cleanup()
 
-    def generate_parallel(self, starting_id):
+    def split_work(self, starting_id, workers, suffix=None, records=None):
+        suffix = suffix or self.datafile_suffix
         all_files = []
-        records = int((3342227 * self.size) / self.threads)
-        for thread_id in range(1, self.threads + 1):
-            file_name = f'People_data_{thread_id}_{records}.csv'
-            file_details = ['customers_test', file_name, records, int((thread_id - 1) * records) + starting_id]
-            all_files.append(file_details)
-        with ProcessPoolExecutor(max_workers=self.threads) as executor:
-            executor.map(self.output_generated_data, all_files)
+        records = int(3342227 * self.size) if records is None else records
+        first_id = starting_id
+        for thread_id in range(1, workers + 1):
+            # The first records % workers workers take one extra row so that none are lost
+            rows = records // workers + (1 if thread_id <= records % workers else 0)
+            file_name = f'{self.datafile_prefix}_{thread_id}_{rows}.{suffix}'
+            all_files.append(['customers_test', file_name, rows, first_id])
+            first_id += rows
+        return all_files
+
+    def split_chunks(self, starting_id, records):
+        # --chunksize row chunks covering exactly records rows from starting_id
+        all_chunks = []
+        for first_id in range(starting_id, starting_id + records, self.chunk_size):
+            rows = min(self.chunk_size, starting_id + records - first_id)
+            all_chunks.append(['customers_test', f'{self.datafile_prefix}_chunk_{first_id}_{rows}.{self.datafile_suffix}', rows, first_id])
+        return all_chunks
+
+    def generate_parallel(self, starting_id, records=None):
+        all_files = self.split_work(starting_id, self.threads, records=records)
+        results = list(self.worker_pool().map(TransactionBench.output_generated_data, all_files))
+        self.results.add_workers([[r[3], r[4], r[1], r[2]] for r in results])
+        self.report_generation_throughput(results)
         return all_files
 
+    def generate_and_load(self, phase, starting_id, records, loading_with_indexes):
+        # The generator processes write --chunksize chunks which the loader processes pick up as soon as each is written,
+        # with no more than --queuedepth chunks written (or being written) and not yet loading. Queue wait is how long
+        # written chunks waited for a loader (loading is the limit), loader wait how long loaders sat idle waiting for a
+        # chunk (generation is the limit)
+        chunks = iter(self.split_chunks(starting_id, records))
+        generators = self.worker_pool()
+        loaders = self.loader_pool()
+        generating = {}
+        loading = {}
+        ready = collections.deque()
+        generation_results = []
+        load_results = []
+        queue_wait = 0.0
+        loader_wait = 0.0
+        chunk_count = 0
+        while True:
+            while len(generating) + len(ready) < self.queue_depth:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                generating[generators.submit(TransactionBench.output_generated_data, chunk)] = chunk
+                chunk_count += 1
+            while ready and len(loading) < self.threads:
+                chunk, written = ready.popleft()
+                queue_wait += time.perf_counter() - written
+                loading[loaders.submit(self.load_data_task, chunk, loading_with_indexes)] = chunk
+            if not generating and not loading:
+                break
+            waiting_since = time.perf_counter()
+            done, _ = wait(list(generating) + list(loading), return_when=FIRST_COMPLETED)
+            if generating:
+                loader_wait += (time.perf_counter() - waiting_since) * (self.threads - len(loading))
+            for future in done:
+                if future in generating:
+                    chunk = generating.pop(future)
+                    generation_results.append(future.result())
+                    ready.append((chunk, generation_results[-1][4]))
+                else:
+                    chunk = loading.pop(future)
+                    load_results.append(future.result())
+                    if load_results[-1][3] is None:
+                        load_results[-1][3] = os.path.getsize(chunk[1])
+                    if self.delete_gen_file:
+                        os.remove(chunk[1])
+        self.delete_files([])
+        self.report_generation_throughput(generation_results)
+        self.report_load_results(load_results)
+        phase.update({'chunks': chunk_count, 'queue_wait': queue_wait, 'loader_wait': loader_wait})
+        limit = 'loading' if queue_wait > loader_wait else 'generation'
+        print(f"{Fore.LIGHTBLACK_EX}{chunk_count} chunks of up to {self.chunk_size} rows, queue depth {self.queue_depth} : chunks waited {queue_wait:.2f}s "
+              f"for a loader, loaders waited {loader_wait:.2f}s for a chunk, so {limit} is the limit{Style.RESET_ALL}")
+
     def create_table(self):
         with self.get_connection() as connection:
             with connection.cursor() as cur:
-                if self.target == "PostgreSQL" or self.target == "MySQL":
-                    cur.execute(self.drop_table_p)
-                    logging.debug(f"Statement executed : {self.drop_table_p}")
-                    cur.execute(self.table_defintion_p)
-                    logging.debug(f"Statement executed : {self.drop_table_p}")
-                elif self.target == "Oracle":
-                    try:
-                        cur.execute(self.drop_table_o)
-                        logging.debug(f"Statement executed : {self.drop_table_o}")
-                    except Exception as e:
-                        print(f"{Fore.LIGHTBLACK_EX}Table probably already existed : {e}{Fore.RESET}")
-                    cur.execute(self.table_defintion_o)
-                    logging.debug(f"Statement executed : {self.table_defintion_o}")
+                self.backend.create_table(connection, cur)
                 connection.commit()
 
-    def generate_seed_data(self) -> []:
-        fake = Faker('en_GB', use_weighting=False)
-        for i in range(self.seed_data_size):
+    def generate_seed_data(self):
+        cache_name = os.path.join(self.seed_cache_dir, f'seed_pool_{self.seed_locale}_{self.seed_data_size}_{self.seed}')
+        self.seed_pool = SeedPool(f'{cache_name}.offsets.npy', f'{cache_name}.blob.npy')
+        if self.seed_pool.exists():
+            print(f'{Fore.LIGHTBLACK_EX}Using cached seed data {cache_name}{Style.RESET_ALL}')
+        else:
+            self.build_seed_pool()
+        self.seed_pool.share()
+        atexit.register(self.seed_pool.release)
+
+    def build_seed_pool(self):
+        # Each chunk is seeded from (seed, chunk number) so the pool is the same however many workers build it
+        chunks = range(0, self.seed_data_size, self.seed_chunk_size)
+        with ProcessPoolExecutor(max_workers=self.threads) as executor:
+            seed_rows = [row for rows in executor.map(TransactionBench.generate_seed_chunk,
+                                                      [self.seed_locale] * len(chunks),
+                                                      [self.seed * 1000003 + i // self.seed_chunk_size for i in chunks],
+                                                      [min(self.seed_chunk_size, self.seed_data_size - i) for i in chunks]) for row in rows]
+        os.makedirs(self.seed_cache_dir, exist_ok=True)
+        self.seed_pool.save(seed_rows)
+
+    @staticmethod
+    def generate_seed_chunk(locale, chunk_seed, rows) -> []:
+        # Returns each seed row pre-encoded as the bytes that follow the Id column, i.e. b"|email|prefix|...|password\n".
+        # Generating a row is then just formatting the Id and concatenating it with one of these fragments.
+        from faker import Faker
+        fake = Faker(locale, use_weighting=False)
+        fake.seed_instance(chunk_seed)
+        seed_rows = []
+        for i in range(rows):
             full_name = fake.name()
             FLname = full_name.split(" ")
             Fname = FLname[0]
@@ -283,7 +1801,7 @@ class TransactionBench:
             domain_name = "@gmail.com"
             userId = Fname + "." + Lname + domain_name
 
-            self.seed_data.append({
+            row = {
                 "Id": i,
                 "EmailId": userId,
                 "Prefix": fake.prefix(),
@@ -303,122 +1821,384 @@ class TransactionBench:
                 "Occupation": fake.job(),
                 "Bank": fake.aba(),
                 "Password": fake.password()
-            })
+            }
+            seed_rows.append(("|" + "|".join(str(row[h]) for h in TransactionBench.seed_headers[1:]) + "\n").encode('utf-8'))
+        return seed_rows
+
+    @staticmethod
+    def init_worker(seed_pool_name, offsets_count, data_seed, pool_created, backend):
+        # backend is only passed with --connectionpool, in which case the worker opens the connection it will use for
+        # every task up front so that connecting and authenticating is never part of a phase's timing
+        global worker_seed_pool, worker_data_seed, worker_startup_time
+        worker_seed_pool = SeedPool.attach(seed_pool_name, offsets_count)
+        worker_data_seed = data_seed
+        worker_startup_time = time.time() - pool_created
+        if process_connection is not None and process_connection[0] != os.getpid():
+            inherited_connections.append(process_connection)
+        if backend is not None:
+            backend.open_pooled_connection()
+
+    @staticmethod
+    def warm_up_worker(backend, warm_up):
+        # Returns the worker's [pid, connect start, connect end]. Sleeps briefly so the tasks spread over every worker
+        time.sleep(0.05)
+        if warm_up:
+            backend.warm_up()
+        return [os.getpid(), process_connection[2], process_connection[3]]
+
+    @staticmethod
+    def worker_stats():
+        # Time from the pool being created to this worker being ready, and the worker's RSS excluding the shared memory
+        # it has mapped (i.e. excluding the seed pool). Falls back to peak RSS where /proc isn't available.
+        try:
+            with open('/proc/self/status') as status:
+                memory = {line.split(':')[0]: int(line.split()[1]) for line in status if line.startswith(('VmRSS', 'RssShmem'))}
+            return [worker_startup_time, (memory['VmRSS'] - memory.get('RssShmem', 0)) / 1024]
+        except (OSError, KeyError):
+            return [worker_startup_time, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024]
+
+    def worker_pool(self):
+        # One pool of -tc worker processes, attached to the shared seed pool, used by every phase of the run
+        if self.executor is None:
+            self.executor = self.new_worker_pool(self.threads)
+            atexit.register(self.executor.shutdown)
+        return self.executor
+
+    def loader_pool(self):
+        # With --chunksize loads run in a second pool of -tc processes so that they overlap with generation. Its workers
+        # are started as soon as it's created so that doesn't land in a timed phase
+        if self.loader_executor is None:
+            self.loader_executor = self.new_worker_pool(self.threads)
+            atexit.register(self.loader_executor.shutdown)
+            list(self.loader_executor.map(time.sleep, [0.05] * self.threads))
+        return self.loader_executor
+
+    def worker_pools(self):
+        return [self.worker_pool()] + ([self.loader_pool()] if self.chunk_size and not self.stream else [])
+
+    def new_worker_pool(self, workers):
+        return ProcessPoolExecutor(max_workers=workers, initializer=TransactionBench.init_worker,
+                                   initargs=(self.seed_pool.shared_memory.name, len(self.seed_pool.offsets), self.seed, time.time(),
+                                             self.backend if self.connection_pool else None))
+
+    def shutdown(self):
+        # Stops the worker processes, closes the main process's pooled connection and frees the seed pool so that
+        # another TransactionBench can run in this process (--matrixscales/--matrixthreads)
+        global process_connection
+        for executor in (self.executor, self.loader_executor):
+            if executor is not None:
+                executor.shutdown()
+        self.executor = None
+        self.loader_executor = None
+        if process_connection is not None and process_connection[0] == os.getpid():
+            process_connection[1].connection.close()
+            process_connection = None
+        if self.seed_pool is not None:
+            self.seed_pool.release()
+        if self.telemetry is not None:
+            self.telemetry.close()
+
+    def __getstate__(self):
+        # Bound methods sent to the workers pickle the instance, which mustn't drag the executor or results along
+        state = self.__dict__.copy()
+        state['executor'] = None
+        state['loader_executor'] = None
+        state['results'] = None
+        state['telemetry'] = None
+        return state
 
-    def output_generated_data(self, file_details: []):
+    def open_connection_pool(self):
+        # Opens the main process's connection and starts every worker (which opens its own in init_worker), then
+        # records each connection's setup time as a worker of the current phase
+        self.backend.open_pooled_connection()
+        if self.warm_up:
+            self.backend.warm_up()
+        connections = {os.getpid(): [process_connection[2], process_connection[3]]}
+        for executor in self.worker_pools():
+            pids = set()
+            for _ in range(3):
+                for pid, start, end in executor.map(TransactionBench.warm_up_worker, [self.backend] * self.threads, [self.warm_up] * self.threads):
+                    connections[pid] = [start, end]
+                    pids.add(pid)
+                if len(pids) == self.threads:
+                    break
+        latencies = [(end - start) * 1000 for start, end in connections.values()]
+        self.results.add_workers([[start, end, 0, None] for start, end in connections.values()])
+        print(f"{Fore.LIGHTBLACK_EX}Connect latency over {len(latencies)} connections min {min(latencies):.1f}ms, avg {sum(latencies) / len(latencies):.1f}ms, max {max(latencies):.1f}ms{Style.RESET_ALL}")
+
+    @staticmethod
+    def generate_blocks(seed_pool, file_details: [], data_seed):
+        # Blocks are aligned to Ids and each has its own RNG seeded from (data_seed, block number), so a given Id always
+        # gets the same row however the Ids are split between workers, chunks or clients
         records = file_details[2]
-        headers = ["Id", "EmailId", "Prefix", "CustomerName", "BirthDate", "PhoneNumber", "AdditionalEmailId", "Address", "ZipCode", "City", "State", "Country", "YearJoined", "TimeJoined", "Link", "CustomerComments", "Occupation", "Bank", "Password"]
-        with open(file_details[1], 'wt', encoding='utf-8') as csvFile:
-            writer = csv.DictWriter(csvFile, fieldnames=headers, delimiter="|", quoting=csv.QUOTE_NONE, )
-            for i in range(file_details[3], file_details[3] + records):
-                rand_pointer = int(random() * self.seed_data_size)
-                data = self.seed_data[rand_pointer]
-                data["Id"] = i
-                writer.writerow(data)
+        first_id = file_details[3]
+        offsets = seed_pool.offsets
+        blob = seed_pool.blob
+        block_size = TransactionBench.generation_block_size
+        for aligned_start in range(first_id - first_id % block_size, first_id + records, block_size):
+            rng = np.random.default_rng([data_seed, aligned_start // block_size])
+            block_start = max(aligned_start, first_id)
+            block_end = min(aligned_start + block_size, first_id + records)
+            seed_indexes = rng.integers(0, len(offsets) - 1, block_size)[block_start - aligned_start:block_end - aligned_start]
+            # Interleave the formatted ids with memoryview slices of the shared blob and let join() do the only copy
+            parts = [None] * (2 * (block_end - block_start))
+            parts[0::2] = [b"%d" % row_id for row_id in range(block_start, block_end)]
+            parts[1::2] = [blob[start:end] for start, end in zip(offsets[seed_indexes].tolist(), offsets[seed_indexes + 1].tolist())]
+            yield b"".join(parts)
+
+    @staticmethod
+    def output_generated_data(file_details: []):
+        # Compresses as it goes when the datafile name has a --compress suffix, timing compression and writes separately
+        bytes_written = 0
+        compress_seconds = 0.0
+        write_seconds = 0.0
+        codec = compression_codec(file_details[1])
+        compressor = new_compressor(codec) if codec else None
+        start = time.perf_counter()
+        with open(file_details[1], 'wb', buffering=1024 * 1024) as data_file:
+            for block in TransactionBench.generate_blocks(worker_seed_pool, file_details, worker_data_seed):
+                bytes_written += len(block)
+                if compressor is not None:
+                    compress_start = time.perf_counter()
+                    block = compressor.compress(block)
+                    compress_seconds += time.perf_counter() - compress_start
+                write_start = time.perf_counter()
+                data_file.write(block)
+                write_seconds += time.perf_counter() - write_start
+            # Synced so the write time is the disk's and not just copies into the page cache, compressed or not
+            write_start = time.perf_counter()
+            if compressor is not None:
+                data_file.write(compressor.flush())
+            data_file.flush()
+            os.fsync(data_file.fileno())
+            write_seconds += time.perf_counter() - write_start
+        return [file_details[1], file_details[2], bytes_written, start, time.perf_counter(), os.path.getsize(file_details[1]),
+                compress_seconds, write_seconds] + TransactionBench.worker_stats()
+
+    @staticmethod
+    def write_to_pipe(pipe_name, blocks, bytes_written: []):
+        # Runs in a thread alongside the loader. Opening the FIFO blocks until the loader opens the other end.
+        try:
+            with open(pipe_name, 'wb', buffering=1024 * 1024) as pipe:
+                for block in blocks:
+                    pipe.write(block)
+                    bytes_written[0] += len(block)
+        except BrokenPipeError:
+            print(f"{Fore.LIGHTBLACK_EX}Loader closed {pipe_name} before all rows were written{Fore.RESET}")
+
+    def stream_data(self, starting_id, loading_with_indexes, workers, records=None):
+        all_pipes = self.split_work(starting_id, workers, 'pipe', records)
+        results = list(self.worker_pool().map(self.stream_data_task, all_pipes, [loading_with_indexes] * len(all_pipes)))
+        self.results.add_workers([r[:4] for r in results])
+        self.results.add_failures([r[4] for r in results])
+        self.report_worker_footprint([r[5:] for r in results])
+        self.delete_files([])
+
+    def stream_data_task(self, file_details, loading_with_indexes):
+        # Returns [start, end, rows, bytes, error] + worker_stats(), as load_data_task counting a failed load as 0 rows
+        start = time.perf_counter()
+        if not self.backend.loads_from_pipe:
+            data_stream = GeneratedDataStream(TransactionBench.generate_blocks(worker_seed_pool, file_details, worker_data_seed))
+            result = self.load_data_task(file_details, loading_with_indexes, data_stream)
+            return [start, time.perf_counter(), result[2], data_stream.bytes_read, result[5]] + TransactionBench.worker_stats()
+        bytes_written, result = self.load_through_pipe(file_details, loading_with_indexes, TransactionBench.generate_blocks(worker_seed_pool, file_details, worker_data_seed))
+        return [start, time.perf_counter(), result[2], bytes_written, result[5]] + TransactionBench.worker_stats()
+
+    def load_through_pipe(self, file_details, loading_with_indexes, blocks):
+        # Loaders such as MySQL's LOAD DATA LOCAL INFILE and Oracle's sqlldr data= only accept a file name so feed them
+        # blocks through a named pipe. Returns the number of bytes written to it and what load_data_task returned
+        pipe_name = file_details[1]
+        if os.path.exists(pipe_name):
+            os.remove(pipe_name)
+        os.mkfifo(pipe_name)
+        bytes_written = [0]
+        writer = threading.Thread(target=TransactionBench.write_to_pipe, args=(pipe_name, blocks, bytes_written))
+        writer.start()
+        try:
+            result = self.load_data_task(file_details, loading_with_indexes)
+        finally:
+            while writer.is_alive():
+                # The loader may have failed without ever opening (or draining) the pipe. Briefly open and then close the read
+                # end so the writer either unblocks from open() or gets a broken pipe rather than waiting forever.
+                fd = os.open(pipe_name, os.O_RDONLY | os.O_NONBLOCK)
+                writer.join(0.1)
+                os.close(fd)
+            writer.join()
+            os.remove(pipe_name)
+        return bytes_written[0], result
+
+    def report_load_results(self, results):
+        # results are the [start, end, rows, bytes, decompress seconds, error] lists returned by load_data_task, bytes filled in
+        self.results.add_workers([r[:4] for r in results])
+        self.results.add_failures([r[5] for r in results])
+        if self.compress is not None:
+            decompress_seconds = sum(r[4] for r in results)
+            print(f"{Fore.LIGHTBLACK_EX}Decompressing took {decompress_seconds:.2f}s CPU across {len(results)} loaders{Style.RESET_ALL}")
+            if self.results.current is not None:
+                self.results.current['decompress_seconds'] = decompress_seconds
+
+    def report_generation_throughput(self, results):
+        # results are the [file_name, rows, bytes, start, end, file size, compress seconds, write seconds, startup seconds, rss MB]
+        # lists returned by output_generated_data
+        for file_name, rows, bytes_written, start, end, *_ in results:
+            logging.debug(f"Generated {file_name} : {rows} rows, {bytes_written / 1048576:.1f}MB in {end - start:.2f}s ({rows / max(end - start, 1e-9):,.0f} rows/s, {bytes_written / 1048576 / max(end - start, 1e-9):.1f} MB/s)")
+        rows_per_sec = [r[1] / max(r[4] - r[3], 1e-9) for r in results]
+        mb_per_sec = [r[2] / 1048576 / max(r[4] - r[3], 1e-9) for r in results]
+        print(f"{Fore.LIGHTBLACK_EX}Generation throughput per worker {sum(rows_per_sec) / len(rows_per_sec):,.0f} rows/s, {sum(mb_per_sec) / len(mb_per_sec):.1f} MB/s "
+              f"(slowest {min(rows_per_sec):,.0f} rows/s, {len(results)} workers){Style.RESET_ALL}")
+        if self.compress is not None:
+            self.report_compression(sum(r[2] for r in results), sum(r[5] for r in results), sum(r[6] for r in results), sum(r[7] for r in results))
+        self.report_worker_footprint([r[8:] for r in results])
+
+    def report_compression(self, raw_bytes, stored_bytes, compress_seconds, write_seconds):
+        # The I/O saved is estimated from the rate the compressed data was written at. Both times are summed over workers
+        ratio = raw_bytes / max(stored_bytes, 1)
+        write_rate = stored_bytes / 1048576 / max(write_seconds, 1e-9)
+        saved_seconds = write_seconds * (ratio - 1)
+        print(f"{Fore.LIGHTBLACK_EX}Compressed {raw_bytes / 1048576:.1f}MB to {stored_bytes / 1048576:.1f}MB ({ratio:.1f}x) with {self.compress}, "
+              f"{compress_seconds:.2f}s CPU compressing against {write_seconds:.2f}s writing ({write_rate:.0f} MB/s), "
+              f"so about {saved_seconds:.2f}s of writes saved{Style.RESET_ALL}")
+        if self.results.current is not None:
+            self.results.current.update({'compressed_bytes': stored_bytes, 'compress_seconds': compress_seconds, 'write_seconds': write_seconds})
+
+    def report_worker_footprint(self, stats):
+        # stats are the [startup seconds, rss MB] lists returned by worker_stats()
+        print(f"{Fore.LIGHTBLACK_EX}Worker startup {max(s[0] for s in stats):.3f}s (slowest), RSS {max(s[1] for s in stats):.1f}MB per worker excluding "
+              f"the shared seed pool ({len(self.seed_pool)} rows, {self.seed_pool.size_mb():.1f}MB){Style.RESET_ALL}")
 
     # def get_connection(self):
     #     return psycopg2.connect(f"host={self.hostname} dbname={self.database} user={self.username} password={self.password}")
 
     def load_data(self, file_details, loading_with_indexes):
-        with ProcessPoolExecutor(max_workers=self.threads) as executor:
-            executor.map(self.load_data_task, file_details, (loading_with_indexes,))
+        results = list(self.worker_pool().map(self.load_data_task, file_details, [loading_with_indexes] * len(file_details)))
+        for r, f in zip(results, file_details):
+            if r[3] is None:
+                r[3] = os.path.getsize(f[1])
+        self.report_load_results(results)
 
-    def load_data_task(self, file_details, loading_with_indexes):
+    def load_data_task(self, file_details, loading_with_indexes, data_stream=None):
+        # Returns [start, end, rows, bytes loaded (None when it's the datafile's size), seconds spent decompressing, error].
+        # A failed load counts as 0 rows and error is its message, otherwise None
+        start = time.perf_counter()
+        rows = file_details[2]
+        bytes_loaded = None
+        decompress_seconds = [0.0]
+        error = None
         try:
-            with open(os.path.join(os.getcwd(), file_details[1]), 'r') as data_file:
-                next(data_file)
-                if self.target == 'PostgreSQL':
-                    with self.get_connection() as connection:
-                        with connection.cursor() as cur:
-                            cur.execute(self.set_date_format)
-                            cur.copy_from(data_file, file_details[0], sep='|')
-                            connection.commit()
-                            # print(f"Loaded file {file_details[1]} with {file_details[2]} rows")
-                elif self.target == 'MySQL':
-                    with self.get_connection() as connection:
-                        with connection.cursor() as cur:
-                            cur.execute(f"LOAD DATA LOCAL INFILE '{file_details[1]}' INTO TABLE {file_details[0].lower()} FIELDS TERMINATED BY '|'")
-                            connection.commit()
-                elif self.target == 'Oracle':
-                    if self.use_dml_to_load:
-                        self.load_file(file_details)
-                    else:
-                        oh = os.getenv('ORACLE_HOME')
-                        if oh is None:
-                            oh = ""
-                        else:
-                            oh = oh + "/"
-                        fd = file_details[1]
-                        with open('t1.ctl', 'w') as cfd:
-                            cfd.write(self.control_file)
-                        cf = 't1.ctl'
-                        if self.connection_string is None:
-                            cs = f"//{self.hostname}/{self.database}"
-                        else:
-                            cs = self.connection_string
-                        if loading_with_indexes:
-                            direct_load_string = ''
-                        else:
-                            direct_load_string = 'direct=true'
-                        sqlldr_command = f"{oh}sqlldr userid={self.username}/{self.password}@'{cs}' data={fd} control={os.path.join(os.getcwd())}/{cf} silent=all direct_path_lock_wait=true {direct_load_string} parallel=true"
-                        result = subprocess.run([sqlldr_command], stdout=subprocess.PIPE, cwd=os.getcwd(), shell=True)
-                        if self.debugging:
-                            print(f"{Fore.LIGHTRED_EX}DEBUG:root:Statement executed : {sqlldr_command}{Fore.RESET}")
-                        if result.returncode != 0:
-                            print(f"Command failed run sqlldr command : {sqlldr_command}")
+            if data_stream is None and compression_codec(file_details[1]) is not None:
+                blocks = decompressed_blocks(file_details[1], decompress_seconds)
+                if self.backend.loads_from_pipe and not self.backend.use_dml_to_load:
+                    bytes_loaded, result = self.load_through_pipe([file_details[0], f'{file_details[1]}.pipe'] + file_details[2:], loading_with_indexes, blocks)
+                    return [start, time.perf_counter(), result[2], bytes_loaded, decompress_seconds[0], result[5]]
+                data_stream = GeneratedDataStream(blocks)
+            if self.backend.use_dml_to_load:
+                self.backend.load_dml(file_details, data_stream)
+            else:
+                self.backend.load(file_details, loading_with_indexes, data_stream)
         except Exception as e:
             print(f"Got unexpected exception : {e}")
-
-    def load_file(self, file_details):
-        with self.get_connection() as connection:
-            file = os.path.join(os.getcwd(), file_details[1])
-            with open(file, 'r') as f:
-                with connection.cursor() as cur:
-                    res = csv.DictReader(f, delimiter='|', fieldnames=[c['ColumnName'] for c in self.customer_columns])
-                    stmt = f"insert into CUSTOMERS_TEST ({','.join([col['ColumnName'] for col in self.customer_columns])}) values ("
-                    for c in self.customer_columns:
-                        if c["DataType"] == "Date":
-                            stmt += f"to_date(:{c['ColumnName']},'{self.date_format}'), "
-                        elif c["DataType"] == "Timestamp":
-                            stmt += f"to_timestamp(:{c['ColumnName']},'{self.timestamp_format}'), "
-                        else:
-                            stmt += f":{c['ColumnName']}, "
-                    stmt = stmt.rstrip(", ")
-                    stmt += ")"
-                    data_array = []
-                    for i, row in enumerate(res):
-                        data_array.append(row)
-                        if i % 1000 == 0:
-                            cur.executemany(stmt, data_array)
-                            data_array = []
-                        if i % 10000 == 0:
-                            connection.commit()
-                    cur.executemany(stmt, data_array)
-                    connection.commit()
+            rows = 0
+            error = str(e)
+        if bytes_loaded is None and data_stream is not None:
+            bytes_loaded = data_stream.bytes_read
+        return [start, time.perf_counter(), rows, bytes_loaded, decompress_seconds[0], error]
 
     def get_connection(self):
-        if self.target == 'PostgreSQL':
-            return psycopg2.connect(f"host={self.hostname} dbname={self.database} user={self.username} password={self.password}")
-        elif self.target == 'MySQL':
-            return mysql.connector.connect(user=self.username, password=self.password, host=self.hostname, database=self.database, allow_local_infile=True)
-        elif self.target == 'Oracle':
-            if self.connection_string is None:
-                return cx_Oracle.connect(self.username, self.password, f'//{self.hostname}/{self.database}')
-            else:
-                return cx_Oracle.connect(self.username, self.password, self.connection_string)
+        return self.backend.connect()
 
     def create_indexes(self):
-        with self.get_connection() as connection:
+        # Returns [index, start, end] for each index, in perf_counter() time
+        if not (self.parallel_indexes and self.backend.concurrent_index_builds):
+            with self.get_connection() as connection:
+                return [self.create_index(index, False, connection) for index in self.backend.index_statements()]
+        indexes = self.backend.index_statements(concurrent=True)
+        timings = []
+        if self.backend.attach_pk is None:
+            timings.append(self.create_index(indexes.pop(0), True))
+        # Every index on its own session (never the pooled one, which can't be shared between threads)
+        with ThreadPoolExecutor(max_workers=len(indexes)) as executor:
+            timings += executor.map(self.create_index, indexes, [True] * len(indexes))
+        if self.backend.attach_pk is not None:
+            timings.append(self.create_index(['Attach primary key', [self.backend.attach_pk]], True))
+        return timings
+
+    def create_index(self, index, own_session, connection=None):
+        with self.backend.open_connection() if own_session else contextlib.nullcontext(connection) as connection:
             with connection.cursor() as cur:
-                cur.execute(self.create_pk)
-                logging.debug(f"Statement executed : {self.create_pk}")
-                cur.execute(self.create_index_1)
-                logging.debug(f"Statement executed : {self.create_index_1}")
-                cur.execute(self.create_index_2)
-                logging.debug(f"Statement executed : {self.create_index_2}")
-                cur.execute(self.create_index_3)
-                logging.debug(f"Statement executed : {self.create_index_3}")
+                start = time.perf_counter()
+                for statement in index[1]:
+                    cur.execute(statement)
+                    logging.debug(f"Statement executed : {statement}")
                 connection.commit()
+                return [index[0], start, time.perf_counter()]
+
+    def report_index_timings(self, phase, timings, phase_start):
+        phase['indexes'] = [{'index': index, 'start': start - phase_start, 'end': end - phase_start, 'elapsed': end - start} for index, start, end in timings]
+        slowest = max(phase['indexes'], key=lambda i: i['elapsed'])
+        for index in phase['indexes']:
+            colour = f"{Style.BRIGHT}{Fore.RED}" if index is slowest else Fore.LIGHTBLACK_EX
+            print(f"{Fore.LIGHTBLACK_EX}  {index['index']:<14} {colour}{ResultsCollector.format_time(index['elapsed'])}{Style.RESET_ALL}"
+                  f"{Fore.LIGHTBLACK_EX} (from {index['start']:.3f}s to {index['end']:.3f}s){Style.RESET_ALL}")
+
+    def update_parallel(self, workers, chunk_size, max_id):
+        # Splits Ids 0..max_id into one contiguous range per worker, each of which updates its range chunk_size Ids
+        # (one commit) at a time. Returns [rows/s, retries, seconds lost to lock waits and retries] for the configuration
+        ranges = [[max_id * w // workers, max_id * (w + 1) // workers] for w in range(workers)]
+        ranges[-1][1] = max_id + 1
+        comment = f'Updated by {workers} workers in chunks of {chunk_size}'
+        with self.new_worker_pool(workers) as executor:
+            # Start the workers (and with --connectionpool connect them) before the clock starts
+            list(executor.map(time.sleep, [0.05] * workers))
+            with self.results.phase(f'Updated rows in parallel with {workers} workers in chunks of {chunk_size}', key=False) as phase:
+                results = list(executor.map(self.update_range_task, [r[0] for r in ranges], [r[1] for r in ranges], [chunk_size] * workers, [comment] * workers))
+                self.results.add_workers([r[:4] for r in results])
+            phase['retries'] = sum(r[4] for r in results)
+            phase['lock_wait'] = sum(r[5] for r in results)
+        return [phase['rows_per_sec'] or 0, phase['retries'], phase['lock_wait']]
+
+    def update_range_task(self, first_id, last_id, chunk_size, comment):
+        statement = self.parallel_update_statement.format(self.backend.bind_marker(1), self.backend.bind_marker(2), self.backend.bind_marker(3))
+        lock_statement = self.backend.lock_chunk_statement(self.update_lock_timeout)
+        start = time.perf_counter()
+        rows = 0
+        retries = 0
+        lock_wait = 0.0
+        with self.get_connection() as connection:
+            with connection.cursor() as cur:
+                for timeout_statement in self.backend.lock_timeout_statements(self.update_lock_timeout):
+                    cur.execute(timeout_statement)
+                for chunk_start in range(first_id, last_id, chunk_size):
+                    chunk_end = min(chunk_start + chunk_size, last_id)
+                    while True:
+                        attempt = time.perf_counter()
+                        try:
+                            if lock_statement is not None:
+                                cur.execute(lock_statement, [chunk_start, chunk_end])
+                            cur.execute(statement, [comment, chunk_start, chunk_end])
+                            rows += max(cur.rowcount, 0)
+                            connection.commit()
+                            break
+                        except Exception as e:
+                            if not self.backend.is_lock_error(e) or retries >= self.update_max_retries:
+                                raise
+                            connection.rollback()
+                            retries += 1
+                            time.sleep(min(0.01 * 2 ** min(retries, 6), 1.0))
+                            lock_wait += time.perf_counter() - attempt
+                for timeout_statement in self.backend.reset_lock_timeout_statements():
+                    cur.execute(timeout_statement)
+        return [start, time.perf_counter(), rows, None, retries, lock_wait]
+
+    def run_update_sweep(self, max_id):
+        sweep = []
+        for workers in self.update_workers:
+            for chunk_size in self.update_chunks:
+                sweep.append([workers, chunk_size] + self.update_parallel(workers, chunk_size, max_id))
+        print(f"{'Update workers':>14}{'Chunk':>10}{'Rows/s':>14}{'Retries':>10}{'Lock wait':>12}")
+        best = max(s[2] for s in sweep)
+        for workers, chunk_size, rows_per_sec, retries, lock_wait in sweep:
+            colour = f"{Style.BRIGHT}{Fore.RED}" if rows_per_sec == best else ""
+            print(f"{workers:>14}{chunk_size:>10}{colour}{rows_per_sec:>14,.0f}{Style.RESET_ALL}{retries:>10}{lock_wait:>11.3f}s")
 
     def update_data(self):
         with self.get_connection() as connection:
@@ -426,6 +2206,7 @@ class TransactionBench:
                 cur.execute(self.update_statement)
                 logging.debug(f"Statement executed : {self.update_statement}")
                 connection.commit()
+                return cur.rowcount
 
     def scan_data(self):
         with self.get_connection() as connection:
@@ -435,24 +2216,191 @@ class TransactionBench:
                 rows = cur.fetchall()
 
 
+class MatrixRunner:
+    # Runs the tests once per scale, thread count and repetition, each run creating the table afresh, and reports each
+    # phase's median, min and standard deviation over the repetitions with the speedup and parallel efficiency of its
+    # median against the lowest thread count (ideally 1) at the same scale. Thread counts are interleaved within each
+    # repetition so drift on the server doesn't all land on one of them
+
+    total_phase = 'Total time taken for key tests'
+
+    csv_headers = ['scale', 'threads', 'phase', 'key', 'runs', 'median', 'min', 'stddev', 'speedup', 'efficiency']
+
+    def __init__(self, args, scales, thread_counts, repeat):
+        self.args = args
+        self.scales = scales
+        self.thread_counts = sorted(thread_counts)
+        self.repeat = repeat
+        self.timings = {}
+        self.summary = []
+
+    def run(self):
+        for scale in self.scales:
+            for repetition in range(1, self.repeat + 1):
+                for threads in self.thread_counts:
+                    print(f"{Style.BRIGHT}{Fore.LIGHTRED_EX}Matrix run at scale {scale} with {threads} threads, repetition {repetition} of {self.repeat}{Style.RESET_ALL}")
+                    tb = TransactionBench(argparse.Namespace(**{**vars(self.args), 'size': scale, 'threads': threads, 'resultsfile': None}))
+                    try:
+                        tb.run_tests()
+                    finally:
+                        tb.shutdown()
+                    # {phase name: [key, [elapsed seconds per repetition]]} for each (scale, threads)
+                    phases = self.timings.setdefault((scale, threads), {})
+                    for phase in tb.results.phases:
+                        phases.setdefault(phase['name'], [phase['key'], []])[1].append(phase['elapsed'])
+                    phases.setdefault(self.total_phase, [True, []])[1].append(tb.results.total_time())
+        self.summarise()
+        self.print_summary()
+        if self.args.resultsfile is not None:
+            self.save(self.args.resultsfile)
+            print(f"{Fore.LIGHTBLACK_EX}Results written to {self.args.resultsfile}{Style.RESET_ALL}")
+
+    def summarise(self):
+        baseline_threads = self.thread_counts[0]
+        for scale in self.scales:
+            baseline = self.timings[(scale, baseline_threads)]
+            for threads in self.thread_counts:
+                for name, (key, elapsed) in self.timings[(scale, threads)].items():
+                    median = statistics.median(elapsed)
+                    speedup = None
+                    efficiency = None
+                    if name in baseline and median > 0:
+                        speedup = statistics.median(baseline[name][1]) / median
+                        efficiency = speedup * baseline_threads / threads
+                    self.summary.append({'scale': scale, 'threads': threads, 'phase': name, 'key': key, 'runs': len(elapsed), 'median': median, 'min': min(elapsed),
+                                         'stddev': statistics.stdev(elapsed) if len(elapsed) > 1 else 0.0, 'speedup': speedup, 'efficiency': efficiency})
+
+    def print_summary(self):
+        # Only the key phases. The saved results have every phase
+        for scale in self.scales:
+            print(f"{Style.BRIGHT}Scale {scale}, seconds over {self.repeat} runs of each, speedup and efficiency against {self.thread_counts[0]} "
+                  f"{'thread' if self.thread_counts[0] == 1 else 'threads'}{Style.RESET_ALL}")
+            print(f"{'Phase':<60}{'Threads':>8}{'Median':>10}{'Min':>10}{'Stddev':>10}{'Speedup':>9}{'Efficiency':>12}")
+            for row in (r for r in self.summary if r['scale'] == scale and r['key']):
+                colour = f"{Style.BRIGHT}{Fore.RED}" if row['phase'] == self.total_phase else ""
+                speedup = f"{row['speedup']:>8.2f}x" if row['speedup'] is not None else f"{'':>9}"
+                efficiency = f"{row['efficiency']:>12.0%}" if row['efficiency'] is not None else ""
+                print(f"{colour}{row['phase']:<60}{row['threads']:>8}{row['median']:>10.3f}{row['min']:>10.3f}{row['stddev']:>10.3f}{speedup}{efficiency}{Style.RESET_ALL}")
+
+    def save(self, file_name):
+        if file_name.lower().endswith('.csv'):
+            with open(file_name, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.csv_headers)
+                writer.writeheader()
+                writer.writerows(self.summary)
+        else:
+            with open(file_name, 'w') as f:
+                json.dump({'run': {'target': self.args.target, 'scales': self.scales, 'threads': self.thread_counts, 'repeat': self.repeat,
+                                   'stream': self.args.stream}, 'matrix': self.summary}, f, indent=2)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Run simple batch like tests')
     # group = parser.add_mutually_exclusive_group(required=False)
-    parser.add_argument('-u', '--user', help='sys username', required=True)
-    parser.add_argument('-p', '--password', help='sys password', required=True)
+    parser.add_argument('-u', '--user', help='sys username', required=False)
+    parser.add_argument('-p', '--password', help='sys password', required=False)
     parser.add_argument('-ho', '--hostname', help='hostmname of target database', required=False)
-    parser.add_argument('-d', '--database', help='name of the database/service to run transactions against', required=False)
+    parser.add_argument('-d', '--database', help='name of the database/service (or SQLite file) to run transactions against', required=False)
     parser.add_argument('-cs', '--connectionstring', help='a full connection string rather than using hostname and database', required=False)
     parser.add_argument('-tc', '--threads', help='the number of threads used to simulate users running trasactions', default=1, type=int)
-    parser.add_argument('-t', '--target', help='PostgreSQL,MySQL,Oracle', required=True, choices=['MySQL', 'PostgreSQL', 'Oracle'])
-    parser.add_argument('-s', '--size', help='size of dataset i.e. 1 equivalent to 1GB', default=1.0, required=True, type=float)
+    parser.add_argument('-t', '--target', help=','.join(backends), required=False, choices=list(backends))
+    parser.add_argument('-s', '--size', help='size of dataset i.e. 1 equivalent to 1GB', default=1.0, required=False, type=float)
     parser.add_argument('-dd', '--dontdelete', help="dont delete generated files after run", required=False, action='store_true')
     parser.add_argument('-dl', '--dmlload', help="use dml to load data instead of vendor tool", required=False, action='store_true', default=False)
+    parser.add_argument('-dst', '--dmlstrategy', help="how DML loads insert rows, PostgreSQL/MySQL: executemany,values,prepared,pipelined. Oracle: arraydml. A comma separated list with --dmlsweep (default all)", required=False)
+    parser.add_argument('-dbs', '--dmlbatchsize', help="rows bound per array DML execute when using --dmlload", default=1000, type=int)
+    parser.add_argument('-dcs', '--dmlcommitsize', help="rows loaded between commits when using --dmlload", default=10000, type=int)
+    parser.add_argument('-dsw', '--dmlsweep', '--dml-sweep', help="instead of the normal tests load the data with the bulk loader and then with DML once per strategy and batch size in this comma separated list, reporting rows/s for each", required=False)
+    parser.add_argument('-cp', '--connectionpool', help="open one connection per worker process up front and reuse it for every phase, timing connection setup separately", required=False, action='store_true', default=False)
+    parser.add_argument('-wu', '--warmup', help="run a trivial query on every pooled connection before the tests start", required=False, action='store_true', default=False)
+    parser.add_argument('-pi', '--parallelindexes', help="build the primary key and indexes concurrently, each on its own session", required=False, action='store_true', default=False)
+    parser.add_argument('-ip', '--indexparallelism', help="build each index with this many server processes (Oracle PARALLEL n NOLOGGING, PostgreSQL max_parallel_maintenance_workers, MySQL innodb_ddl_threads and online DDL)", type=int, required=False)
+    parser.add_argument('-pu', '--parallelupdate', help="after the single update also update the table by Id range in parallel, in commit sized chunks", required=False, action='store_true', default=False)
+    parser.add_argument('-uw', '--updateworkers', help="comma separated worker counts to sweep for --parallelupdate (default -tc)", required=False)
+    parser.add_argument('-uc', '--updatechunks', help="comma separated Ids per commit to sweep for --parallelupdate", default='10000')
+    parser.add_argument('-ol', '--oltp', help="finish with concurrent OLTP sessions running point lookups and single row updates", required=False, action='store_true', default=False)
+    parser.add_argument('-os', '--oltpsessions', help="number of concurrent OLTP sessions (default -tc)", type=int)
+    parser.add_argument('-od', '--oltpduration', help="seconds to run the OLTP sessions for", default=30.0, type=float)
+    parser.add_argument('-oo', '--oltpops', help="run this many OLTP operations in total instead of for --oltpduration", type=int)
+    parser.add_argument('-om', '--oltpmix', help="weighted mix of OLTP operations", default='pk=50,email=15,city=10,birthdate=10,update=15')
+    parser.add_argument('-cz', '--compress', help="compress the generated datafiles, decompressing them as they're loaded", choices=list(compression_suffixes), required=False)
+    parser.add_argument('-cks', '--chunksize', help="generate and load the parallel phases as a queue of chunks of this many rows, loading each as soon as it's written", type=int, required=False)
+    parser.add_argument('-qd', '--queuedepth', help="most chunks written but not yet loading with --chunksize (default 2 x -tc)", type=int, required=False)
+    parser.add_argument('-st', '--stream', help="stream generated data straight into the loader rather than writing datafiles", required=False, action='store_true', default=False)
+    parser.add_argument('-sds', '--seeddatasize', help='number of distinct seed rows used to generate the data set', default=10000, type=int)
+    parser.add_argument('--seed', help='random seed used to generate the seed data', default=0, type=int)
+    parser.add_argument('--seedcache', help='directory used to cache generated seed data between runs', default='seed_cache')
+    parser.add_argument('-sc', '--servercounters', help="record the server's counters and the client's CPU and disk writes over each phase", required=False, action='store_true', default=False)
+    parser.add_argument('-si', '--sampleinterval', help="seconds between samples of the client's CPU and disk writes with --servercounters", default=0.5, type=float)
+    parser.add_argument('-ms', '--matrixscales', help="comma separated scales to run the tests at, one after another", required=False)
+    parser.add_argument('-mt', '--matrixthreads', help="comma separated thread counts to run the tests with at each scale", required=False)
+    parser.add_argument('-rp', '--repeat', help="number of times to run each scale and thread count", default=1, type=int)
+    parser.add_argument('-co', '--coordinator', help="HOST:PORT to listen on for --clients clients, which load the data between them", metavar='HOST:PORT', required=False)
+    parser.add_argument('-cl', '--client', help="HOST:PORT of a --coordinator to load data for", metavar='HOST:PORT', required=False)
+    parser.add_argument('-nc', '--clients', help="number of clients the --coordinator waits for", default=2, type=int)
+    parser.add_argument('--authkey', help="shared secret the --coordinator and its clients authenticate each other with, required with either", required=False)
+    parser.add_argument('-rf', '--resultsfile', help='write per phase and per worker results to this file (.csv for CSV, otherwise JSON)', required=False)
+    parser.add_argument('--compare', help='compare two results files and flag regressions rather than running the tests', nargs=2, metavar=('BASE', 'NEW'))
     parser.add_argument('--debug', help='enable debug', required=False, action='store_true')
 
     args = parser.parse_args()
+    if args.compare is not None:
+        sys.exit(1 if ResultsCollector.compare(*args.compare) else 0)
+    if args.target is None:
+        parser.error("the following arguments are required: -t/--target")
+    for op in (item.split('=')[0] for item in args.oltpmix.split(',')):
+        if op not in TransactionBench.oltp_statements:
+            parser.error(f"--oltpmix operations must be from {','.join(TransactionBench.oltp_statements)}")
+    if args.warmup and not args.connectionpool:
+        parser.error("--warmup needs --connectionpool")
+    if args.compress and args.stream:
+        parser.error("--compress has nothing to compress with --stream")
+    if args.chunksize and args.stream:
+        parser.error("--chunksize only applies to datafiles, --stream already overlaps generation and loading")
+    if (args.dmlload or args.dmlsweep is not None) and not backends[args.target].dml_strategies:
+        parser.error(f"DML loading isn't supported for {args.target}")
+    for strategy in args.dmlstrategy.split(',') if args.dmlstrategy else []:
+        if strategy not in backends[args.target].dml_strategies:
+            parser.error(f"--dmlstrategy must be one of {','.join(backends[args.target].dml_strategies)} for {args.target}")
+    if args.dmlload and args.dmlstrategy is not None and ',' in args.dmlstrategy:
+        parser.error("--dmlload takes a single --dmlstrategy, lists are only for --dmlsweep")
+    matrix = args.matrixscales is not None or args.matrixthreads is not None or args.repeat > 1
+    if matrix and args.dmlsweep is not None:
+        parser.error("--dmlsweep can't be combined with --matrixscales, --matrixthreads or --repeat")
+    if (args.coordinator or args.client) and (matrix or args.dmlsweep is not None):
+        parser.error("--coordinator and --client can't be combined with --dmlsweep, --matrixscales, --matrixthreads or --repeat")
+    if args.coordinator and args.client:
+        parser.error("a process is either the --coordinator or a --client")
+    # Connections unpickle whatever they're sent, so anyone who can authenticate can run code in the coordinator or a client
+    if (args.coordinator or args.client) and not args.authkey:
+        parser.error("--coordinator and --client need an --authkey, a secret shared only with the hosts taking part")
+    if args.seed < 0:
+        parser.error("--seed must not be negative")
+    if args.compress in compression_packages:
+        try:
+            importlib.import_module(compression_packages[args.compress])
+        except ImportError:
+            parser.error(f"--compress {args.compress} needs the {compression_packages[args.compress]} package")
+    if backends[args.target].requires_login and (args.user is None or args.password is None):
+        parser.error(f"the following arguments are required for {args.target}: -u/--user, -p/--password")
 
     print(f"{Style.BRIGHT}{Fore.LIGHTRED_EX}BatchTests 0.2 running against {args.target} with scale {args.size}{Style.RESET_ALL}")
     print(f"{Style.DIM}{Fore.LIGHTRED_EX}Test started at {datetime.datetime.now():%Y-%m-%d %H:%M:%S}{Style.RESET_ALL}")
 
-    tb = TransactionBench(args)
+    if args.coordinator:
+        host, port = args.coordinator.rsplit(':', 1)
+        TransactionBench(args).run_coordinator((host, int(port)), args.clients)
+    elif args.client:
+        host, port = args.client.rsplit(':', 1)
+        if not TransactionBench(args).run_client((host, int(port))):
+            sys.exit(1)
+    elif matrix:
+        MatrixRunner(args, [float(scale) for scale in args.matrixscales.split(',')] if args.matrixscales else [args.size],
+                     [int(threads) for threads in args.matrixthreads.split(',')] if args.matrixthreads else [args.threads], args.repeat).run()
+    elif args.dmlsweep is not None:
+        tb = TransactionBench(args)
+        tb.run_dml_sweep([int(batch_size) for batch_size in args.dmlsweep.split(',')],
+                         args.dmlstrategy.split(',') if args.dmlstrategy else list(backends[args.target].dml_strategies))
+    else:
+        tb = TransactionBench(args)
+        tb.run_tests()